@@ -2,7 +2,8 @@ import gradio as gr
 import warnings
 warnings.filterwarnings('ignore')
 
-from app import ask, get_stats
+from app import ask, ask_stream, get_stats
+from app.config import LLM_CONCURRENCY, GRADIO_STREAMING, GRADIO_QUEUE_MAX_SIZE
 
 # Example questions
 examples = [
@@ -13,6 +14,16 @@ examples = [
     ["Apa saja prinsip pengelolaan teknologi informasi bank menurut POJK 11 2022?"],
 ]
 
+def bold_snippet(snippet, spans):
+    """Mark the highlighted term spans of a snippet in Markdown bold"""
+    out = []
+    last = 0
+    for start, end in spans:
+        out.append(snippet[last:start] + f"**{snippet[start:end]}**")
+        last = end
+    out.append(snippet[last:])
+    return "".join(out)
+
 def format_citations(sources):
     """Format source citations with snippets"""
     if not sources:
@@ -25,7 +36,7 @@ def format_citations(sources):
         doc = source.get("document", "Unknown")
         page = source.get("page", "N/A")
         score = source.get("score", 0)
-        snippet = source.get("snippet", "")
+        snippet = bold_snippet(source.get("snippet") or "", source.get("highlights") or [])
         
         key = f"{doc}_{page}"
         
@@ -60,6 +71,15 @@ def format_confidence(confidence_info):
     
     return confidence_text
 
+def format_stats(num_sources, confidence_info):
+    confidence_display = format_confidence(confidence_info)
+
+    return f"""
+**Dokumen Digunakan:** {num_sources}
+
+{confidence_display}
+"""
+
 def show_fairness_stats():
     """Display fairness statistics"""
     report = get_stats()
@@ -111,13 +131,7 @@ def ask_question(question):
         
         # Format outputs
         citations = format_citations(sources)
-        confidence_display = format_confidence(confidence_info)
-        
-        stats_text = f"""
-**Dokumen Digunakan:** {num_sources}
-
-{confidence_display}
-"""
+        stats_text = format_stats(num_sources, confidence_info)
         
         return answer, citations, stats_text
         
@@ -126,6 +140,46 @@ def ask_question(question):
         error_msg = f"Error: {str(e)}\n\n{traceback.format_exc()}"
         return error_msg, "", ""
 
+def ask_question_stream(question):
+    """Streaming version of ask_question: citations and confidence appear
+    as soon as retrieval finishes, the answer grows token by token."""
+    if not question.strip():
+        yield "Silakan masukkan pertanyaan", "", ""
+        return
+    
+    answer = ""
+    citations = ""
+    stats_text = ""
+    
+    try:
+        for event in ask_stream(question):
+            if event["type"] == "retrieval":
+                citations = format_citations(event["sources"])
+                stats_text = format_stats(event["num_sources"], event["confidence"])
+                yield "Menyusun jawaban...", citations, stats_text
+            
+            elif event["type"] == "token":
+                answer += event["text"]
+                yield answer, citations, stats_text
+            
+            elif event["type"] == "restart":
+                answer = ""
+                yield f"Menyusun ulang jawaban ({event['reason']})...", citations, stats_text
+            
+            elif event["type"] == "result":
+                yield (
+                    event["answer"],
+                    format_citations(event.get("sources", [])),
+                    format_stats(event.get("num_sources", 0), event.get("confidence", {}))
+                )
+        
+    except Exception as e:
+        import traceback
+        error_msg = f"Error: {str(e)}\n\n{traceback.format_exc()}"
+        yield error_msg, citations, stats_text
+
+answer_fn = ask_question_stream if GRADIO_STREAMING else ask_question
+
 # Custom CSS
 custom_css = """
 #title {
@@ -199,7 +253,7 @@ with gr.Blocks(css=custom_css, theme=gr.themes.Soft()) as demo:
         examples=examples,
         inputs=[question_input],
         outputs=[answer_output, citations_output, stats_output],
-        fn=ask_question,
+        fn=answer_fn,
         cache_examples=False
     )
     
@@ -225,10 +279,17 @@ with gr.Blocks(css=custom_css, theme=gr.themes.Soft()) as demo:
     """)
     
     submit_btn.click(
-        fn=ask_question,
+        fn=answer_fn,
         inputs=[question_input],
-        outputs=[answer_output, citations_output, stats_output]
+        outputs=[answer_output, citations_output, stats_output],
+        concurrency_limit=LLM_CONCURRENCY
     )
 
+# At most LLM_CONCURRENCY generations run at once; the rest wait in the queue
+demo.queue(
+    default_concurrency_limit=LLM_CONCURRENCY,
+    max_size=GRADIO_QUEUE_MAX_SIZE
+)
+
 if __name__ == "__main__":
     demo.launch()
@@ -1,3 +1,10 @@
-from .rag import ask, get_stats
+__all__ = ["ask", "ask_stream", "get_stats"]
 
-__all__ = ["ask", "get_stats"]
+
+def __getattr__(name):
+    # Import the RAG pipeline lazily so tools such as build_index can use
+    # app.* modules without loading the vectorstore and LLM.
+    if name in __all__:
+        from . import rag
+        return getattr(rag, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
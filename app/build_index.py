@@ -1,12 +1,37 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
-from loaders import load_pdfs_with_metadata
-from config import PDF_DIR, CHROMA_DIR
+from app.loaders import load_pdfs_with_metadata, save_documents
+from app.embeddings import build_embeddings
+from app.highlights import SentenceIndex
+from app.dedup import dedup_documents
+from app.config import (
+    PDF_DIR, CHROMA_DIR, PAGE_CACHE_DIR, INDEX_KEEP_VERSIONS, INDEX_SHARDING,
+    DEDUP_ENABLED
+)
+from app.index_versions import (
+    new_version_dir, publish_version, prune_versions, write_manifest
+)
+from app.shards import SHARDING_MODES, group_by_shard, collection_name
 
-def build_index():
-    docs = load_pdfs_with_metadata(PDF_DIR)
+def build_index(embeddings=None, publish=True, sharding=INDEX_SHARDING, dedup=DEDUP_ENABLED):
+    """Build a new index version next to the one being served.
+
+    The version directory holds one Chroma collection per shard, a snapshot
+    of the page documents used for BM25 and a manifest describing the
+    shards. It only becomes live once CURRENT is switched to it by
+    publish_version. With dedup, near-duplicate pages and chunks are
+    dropped before embedding; the kept copy lists them in its "duplicates"
+    metadata.
+    """
+    if sharding not in SHARDING_MODES:
+        raise ValueError(f"Unknown sharding mode: {sharding}")
+
+    docs = load_pdfs_with_metadata(PDF_DIR, cache_dir=PAGE_CACHE_DIR)
+
+    dedup_report = {}
+    if dedup:
+        docs, dedup_report["pages"] = dedup_documents(docs, "pages", sharding=sharding)
 
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=1500,
@@ -14,19 +39,47 @@ def build_index():
     )
     chunks = splitter.split_documents(docs)
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="LazarusNLP/all-indo-e5-small-v4",
-        model_kwargs = {'device':'cpu'}
-    )
+    if dedup:
+        chunks, dedup_report["chunks"] = dedup_documents(chunks, "chunks", sharding=sharding)
 
-    vectorstore = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=CHROMA_DIR
-    )
+    if embeddings is None:
+        embeddings = build_embeddings()
+
+    version, path = new_version_dir(CHROMA_DIR)
+
+    manifest = {"sharding": sharding, "shards": {}, "dedup": dedup_report}
+
+    for key, shard_chunks in sorted(group_by_shard(chunks, sharding).items()):
+        vectorstore = Chroma.from_documents(
+            documents=shard_chunks,
+            embedding=embeddings,
+            persist_directory=str(path / "chroma"),
+            collection_name=collection_name(key)
+        )
+        vectorstore.persist()
+
+        manifest["shards"][key] = {
+            "collection": collection_name(key),
+            "chunks": len(shard_chunks)
+        }
+        print(f" Shard {key}: {len(shard_chunks)} chunks")
+
+    save_documents(docs, path / "pages.json.gz")
+    # Pages and chunks can both be retrieved (BM25 / dense), index both
+    SentenceIndex.build(docs + chunks).save(path / "sentences.json.gz")
+    write_manifest(path, manifest)
+
+    if publish:
+        publish_version(CHROMA_DIR, version)
+        prune_versions(CHROMA_DIR, keep=INDEX_KEEP_VERSIONS)
+
+    stats = embeddings.stats() if hasattr(embeddings, "stats") else None
+    if stats and stats["documents_per_second"]:
+        print(f" Embedded {stats['document_texts']} chunks with {stats['backend']} "
+              f"({stats['documents_per_second']:.1f} chunks/s)")
 
-    vectorstore.persist()
-    print(" Chroma index built ")
+    print(f" Chroma index built (version {version}) ")
+    return version
 
 if __name__ == "__main__":
     build_index()
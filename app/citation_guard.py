@@ -0,0 +1,74 @@
+import re
+
+from app.dedup import doc_sources
+
+CITATION_PATTERN = re.compile(
+    r'(UU|POJK|SEOJK)[\s_]*(?:No\.|Nomor)?\s*(\d+)[\s_/]*(?:Tahun\s*)?(\d{4})',
+    re.IGNORECASE
+)
+
+
+def available_sources(source_docs):
+    # Folded near-duplicates count as available: their text is in the context
+    return [source.upper() for doc, _ in source_docs for source in doc_sources(doc)]
+
+
+def is_available(reg_type, num, year, available_docs):
+    expected_file = f"{reg_type.upper()}_{num}_{year}.PDF"
+    return any(expected_file in doc for doc in available_docs)
+
+
+class StreamingCitationValidator:
+    """Checks citations in LLM output while it is still being generated.
+
+    feed() receives each streamed token and returns the unavailable
+    regulations that were completed by it. Only a short tail of the text is
+    kept between calls, enough to catch a citation split across tokens.
+    """
+
+    TAIL_CHARS = 64
+
+    def __init__(self, source_docs):
+        self.available = available_sources(source_docs)
+        self.buffer = ""
+        self.mentioned = []
+        self.hallucinations = []
+        self._seen = set()
+
+    def _check(self, match):
+        reg_type, num, year = match.groups()
+        key = (reg_type.upper(), num, year)
+        if key in self._seen:
+            return None
+
+        self._seen.add(key)
+        self.mentioned.append(key)
+        if is_available(reg_type, num, year, self.available):
+            return None
+
+        label = f"{reg_type} {num}/{year}"
+        self.hallucinations.append(label)
+        return label
+
+    def feed(self, text):
+        self.buffer += text
+        new = []
+        consumed = 0
+
+        for m in CITATION_PATTERN.finditer(self.buffer):
+            # A match touching the end may still grow with the next token
+            if m.end() == len(self.buffer):
+                break
+            label = self._check(m)
+            if label:
+                new.append(label)
+            consumed = m.end()
+
+        self.buffer = self.buffer[max(consumed, len(self.buffer) - self.TAIL_CHARS):]
+        return new
+
+    def finish(self):
+        """Flush the tail once the stream has ended"""
+        new = [label for label in map(self._check, CITATION_PATTERN.finditer(self.buffer)) if label]
+        self.buffer = ""
+        return new
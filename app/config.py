@@ -4,3 +4,46 @@ TOP_K = 10
 ENABLE_CITATION_VALIDATION = True
 MAX_CITATIONS_PER_ANSWER = 3
 MAX_ANSWER_WORDS = 200
+PAGE_CACHE_DIR = "./page_cache"
+INDEX_KEEP_VERSIONS = 3
+INDEX_WATCH_INTERVAL = 10
+ADMIN_TOKEN = None  # admin and debug endpoints are disabled until this is set
+RETRIEVAL_CONCURRENT = True
+RETRIEVAL_FUSION = "rrf"  # "rrf" or "score"
+RETRIEVAL_POOL_SIZE = 16  # dense-search threads shared by all requests, at least EMBEDDING_MAX_BATCH
+LLM_CONCURRENCY = 2  # keep in line with OLLAMA_NUM_PARALLEL
+GRADIO_STREAMING = True
+GRADIO_QUEUE_MAX_SIZE = 32
+CITATION_STREAM_RETRY = True
+LLM_MODEL = "deepseek-r1:latest"
+LLM_BASE_URL = "http://localhost:11434"
+LLM_PROMPT_FORMAT = "deepseek-r1"  # raw r1 chat format; anything else uses Ollama's template
+LLM_NUM_CTX = 8192
+LLM_TOKENS_PER_WORD = 2.0
+LLM_KEEP_ALIVE = -1  # Ollama keep_alive ("30m", seconds, or -1 to never unload)
+LLM_WARMUP = True  # load the model and its system prefix at startup
+REASONING_MODE = "truncate"  # "keep", "truncate" or "suppress"
+REASONING_MAX_TOKENS = 512
+INDEX_SHARDING = "type"  # None, "type" or "type_year"
+PROFILE_DIR = "./profiles"
+PROFILE_KEEP = 50
+EMBEDDING_MODEL = "LazarusNLP/all-indo-e5-small-v4"
+EMBEDDING_BACKEND = "sentence-transformers"  # "sentence-transformers", "onnx" or "stub"
+EMBEDDING_ONNX_DIR = "./models/all-indo-e5-small-v4-onnx"
+EMBEDDING_QUANTIZE = False
+EMBEDDING_INTRA_OP_THREADS = None  # None keeps the runtime default
+EMBEDDING_INTER_OP_THREADS = None
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_BATCH_WINDOW_MS = 5  # query micro-batching window, 0 disables
+EMBEDDING_MAX_BATCH = 16
+RULES_PATH = "./app/topic_rules.json"
+RULES_RELOAD_INTERVAL = 5  # seconds between rules file mtime checks, 0 disables
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.9  # Jaccard similarity of word shingles
+DEDUP_NUM_PERM = 64
+DEDUP_BANDS = 16
+DEDUP_SHINGLE_SIZE = 5
+DEDUP_SCOPE = "all"  # "all" (across documents of one index shard) or "source" (within one PDF)
+MEMORY_TRACE = False  # tracemalloc during startup (diagnostics only); stopped once the app is initialized
+MEMORY_TRACE_FRAMES = 1
+MEMORY_TRACE_TOP = 5
@@ -0,0 +1,165 @@
+import zlib
+
+import numpy as np
+
+from app.config import (
+    DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEDUP_SHINGLE_SIZE, DEDUP_SCOPE,
+    INDEX_SHARDING
+)
+from app.shards import shard_key
+
+_PRIME = (1 << 61) - 1
+
+# Identity/definition pages are what definition questions select; they are
+# never dropped, even when another document repeats them
+PROTECTED_PAGES = (0, 1)
+
+
+def duplicate_refs(doc):
+    """[(source, page)] of the copies folded into this canonical document"""
+    refs = doc.metadata.get("duplicates")
+    if not refs:
+        return []
+    out = []
+    for ref in refs.split(";"):
+        source, _, page = ref.rpartition(":")
+        out.append((source, int(page) if page.isdigit() else page))
+    return out
+
+
+def doc_sources(doc):
+    """The document's own source plus the sources of its folded duplicates"""
+    return [doc.metadata.get("source", "")] + [s for s, _ in duplicate_refs(doc)]
+
+
+def attributed_ref(doc, expected_filename):
+    """(source, page) to cite for a document locked onto expected_filename.
+
+    A page folded from the requested regulation is cited as that
+    regulation's own page rather than as the canonical copy.
+    """
+    source = doc.metadata.get("source", "")
+    if expected_filename in source.upper():
+        return source, doc.metadata.get("page")
+    for ref_source, ref_page in duplicate_refs(doc):
+        if expected_filename in ref_source.upper():
+            return ref_source, ref_page
+    return source, doc.metadata.get("page")
+
+
+def other_refs(doc, cited):
+    """All (source, page) copies of the document except the cited one"""
+    refs = [(doc.metadata.get("source", ""), doc.metadata.get("page"))] + duplicate_refs(doc)
+    return [ref for ref in refs if ref != cited]
+
+
+class MinHasher:
+    def __init__(self, num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 2 ** 31 - 1, size=num_perm).astype(np.uint64)
+        self.shingle_size = shingle_size
+
+    def shingles(self, text):
+        words = text.lower().split()
+        k = min(self.shingle_size, len(words))
+        return {
+            zlib.crc32(" ".join(words[i:i + k]).encode("utf-8"))
+            for i in range(len(words) - k + 1)
+        } if k else set()
+
+    def signature(self, shingles):
+        x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+        # a < 2^31 and x < 2^32, so a*x + b fits in uint64
+        return ((np.outer(self.a, x) + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+class NearDuplicateFilter:
+    """MinHash + LSH banding; the first copy seen is kept as canonical.
+
+    Candidates from the LSH buckets are confirmed with the exact Jaccard
+    similarity of their shingle sets before a document is dropped. Copies
+    are only folded within one index shard: the router searches the shard
+    of the regulation a question names, so a copy kept in another shard
+    would never be found.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM,
+                 bands=DEDUP_BANDS, scope=DEDUP_SCOPE, sharding=INDEX_SHARDING):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.scope = scope
+        self.sharding = sharding
+        self.hasher = MinHasher(num_perm)
+
+    def _bucket_keys(self, signature, source):
+        scope = source if self.scope == "source" else shard_key(source, self.sharding)
+        return [
+            (scope, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def filter(self, documents):
+        """Returns (kept documents, report)"""
+        buckets = {}
+        kept = []
+        shingle_sets = []
+        refs = []
+        dropped = 0
+
+        for doc in documents:
+            shingles = self.hasher.shingles(doc.page_content)
+            if not shingles:
+                kept.append(doc)
+                shingle_sets.append(shingles)
+                refs.append([])
+                continue
+
+            source = doc.metadata.get("source", "")
+            keys = self._bucket_keys(self.hasher.signature(shingles), source)
+
+            canonical = None
+            for key in keys:
+                for idx in buckets.get(key, ()):
+                    other = shingle_sets[idx]
+                    jaccard = len(shingles & other) / len(shingles | other)
+                    if jaccard >= self.threshold:
+                        canonical = idx
+                        break
+                if canonical is not None:
+                    break
+
+            if canonical is not None and doc.metadata.get("page") not in PROTECTED_PAGES:
+                refs[canonical].append(f"{source}:{doc.metadata.get('page')}")
+                dropped += 1
+                continue
+
+            idx = len(kept)
+            kept.append(doc)
+            shingle_sets.append(shingles)
+            refs.append([])
+            for key in keys:
+                buckets.setdefault(key, []).append(idx)
+
+        for doc, doc_refs in zip(kept, refs):
+            if doc_refs:
+                existing = doc.metadata.get("duplicates")
+                doc.metadata["duplicates"] = ";".join(([existing] if existing else []) + doc_refs)
+
+        report = {
+            "before": len(documents),
+            "after": len(kept),
+            "removed": dropped,
+            "reduction": dropped / len(documents) if documents else 0.0
+        }
+        return kept, report
+
+
+def dedup_documents(documents, label="documents", **kwargs):
+    kept, report = NearDuplicateFilter(**kwargs).filter(documents)
+    print(f" Dedup {label}: {report['before']} -> {report['after']} "
+          f"({report['reduction'] * 100:.1f}% removed)")
+    return kept, report
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config import EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH
+from app.profiling import stage
+
+
+class BatchingEmbeddings(Embeddings):
+    """Micro-batches query embeddings from concurrent requests.
+
+    embed_query() puts the text on a queue and waits for its vector. One
+    worker thread takes the first waiting query, collects whatever else
+    arrives within window_ms (up to max_batch) and embeds them in a single
+    forward pass, so concurrent requests stop competing for the same cores
+    with one-sentence passes. Document embedding (ingest) goes straight to
+    the backend, which batches it already.
+    """
+
+    def __init__(self, backend, window_ms=EMBEDDING_BATCH_WINDOW_MS, max_batch=EMBEDDING_MAX_BATCH,
+                 sample_size=1000):
+        self.backend = backend
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._waits = deque(maxlen=sample_size)
+        self._forward_seconds = 0.0
+        self._batches = 0
+        self._queries = 0
+
+    def embed_documents(self, texts):
+        return self.backend.embed_documents(texts)
+
+    def embed_query(self, text):
+        if self.window <= 0 or self.max_batch <= 1:
+            return self.backend.embed_query(text)
+
+        # The forward pass runs on the batcher thread, which profiling never
+        # reaches before Python 3.12; the stage still times wait + forward
+        with stage("embed_query"):
+            self._ensure_worker()
+            future = Future()
+            self._queue.put((text, future, time.perf_counter()))
+            return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._embed_batch(batch)
+            except Exception as e:
+                # Never leave a caller blocked on future.result()
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _embed_batch(self, batch):
+        texts = [text for text, _, _ in batch]
+        started = time.perf_counter()
+        vectors = self.backend.embed_queries(texts)
+        forward = time.perf_counter() - started
+
+        if len(vectors) != len(batch):
+            raise RuntimeError(f"Embedding backend returned {len(vectors)} vectors for {len(batch)} queries")
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._queries += len(batch)
+            self._forward_seconds += forward
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._waits.extend(started - queued for _, _, queued in batch)
+
+    def batching_stats(self):
+        with self._stats_lock:
+            waits = np.array(self._waits) * 1000
+            sizes = dict(sorted(self._batch_sizes.items()))
+            batches, queries, forward = self._batches, self._queries, self._forward_seconds
+
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "queued": self._queue.qsize(),
+            "batches": batches,
+            "queries": queries,
+            "batch_size_avg": queries / batches if batches else None,
+            "batch_size_histogram": sizes,
+            "forward_ms_avg": 1000 * forward / batches if batches else None,
+            "queue_wait_ms": {
+                "avg": float(waits.mean()),
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "max": float(waits.max())
+            } if len(waits) else None
+        }
+
+    def size(self):
+        return {"queued": self._queue.qsize(), "wait_samples": len(self._waits)}
+
+    def stats(self):
+        return {**self.backend.stats(), "query_batching": self.batching_stats()}
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config import (
+    EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_QUANTIZE,
+    EMBEDDING_INTRA_OP_THREADS, EMBEDDING_INTER_OP_THREADS, EMBEDDING_BATCH_SIZE
+)
+
+EMBEDDING_BACKENDS = ("sentence-transformers", "onnx", "stub")
+
+
+class EmbeddingBackend(Embeddings):
+    """LangChain Embeddings with throughput accounting.
+
+    Subclasses implement _embed(texts) for one batch; batching, timing and
+    the query/document split live here.
+    """
+
+    name = "base"
+
+    def __init__(self, batch_size=EMBEDDING_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._stats = {
+            "document_texts": 0, "document_seconds": 0.0,
+            "query_calls": 0, "query_seconds": 0.0
+        }
+
+    def _embed(self, texts):
+        raise NotImplementedError
+
+    def _record(self, kind, count, seconds):
+        with self._lock:
+            if kind == "query":
+                self._stats["query_calls"] += count
+                self._stats["query_seconds"] += seconds
+            else:
+                self._stats["document_texts"] += count
+                self._stats["document_seconds"] += seconds
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed(texts[i:i + self.batch_size]))
+        self._record("documents", len(texts), time.perf_counter() - start)
+        return vectors
+
+    def embed_query(self, text):
+        start = time.perf_counter()
+        vector = self._embed([text])[0]
+        self._record("query", 1, time.perf_counter() - start)
+        return vector
+
+    def embed_queries(self, texts):
+        """Several queries in one forward pass (used by the query batcher)"""
+        start = time.perf_counter()
+        vectors = self._embed(texts)
+        self._record("query", len(texts), time.perf_counter() - start)
+        return vectors
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+
+        return {
+            "backend": self.name,
+            "batch_size": self.batch_size,
+            **s,
+            "documents_per_second": s["document_texts"] / s["document_seconds"] if s["document_seconds"] else None,
+            "query_ms_avg": 1000 * s["query_seconds"] / s["query_calls"] if s["query_calls"] else None
+        }
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The original HuggingFaceEmbeddings path, with torch thread control"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name=EMBEDDING_MODEL, intra_op_threads=EMBEDDING_INTRA_OP_THREADS,
+                 inter_op_threads=EMBEDDING_INTER_OP_THREADS, batch_size=EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size)
+        import torch
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError:
+                # Can only be set once, before any inter-op parallel work
+                print(" torch inter-op threads already fixed, keeping current value")
+
+        self.model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'batch_size': batch_size}
+        )
+
+    def _embed(self, texts):
+        return self.model.embed_documents(texts)
+
+
+class OnnxEmbeddingBackend(EmbeddingBackend):
+    """ONNX Runtime inference from a local export of the model.
+
+    model_dir needs model.onnx and tokenizer.json, e.g. from
+    `optimum-cli export onnx --model LazarusNLP/all-indo-e5-small-v4 <dir>`.
+    With quantize=True an int8 dynamically quantized copy (model.int8.onnx)
+    is created once and used instead.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir=EMBEDDING_ONNX_DIR, quantize=EMBEDDING_QUANTIZE,
+                 intra_op_threads=EMBEDDING_INTRA_OP_THREADS,
+                 inter_op_threads=EMBEDDING_INTER_OP_THREADS,
+                 batch_size=EMBEDDING_BATCH_SIZE, max_length=512):
+        super().__init__(batch_size)
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / "model.onnx"
+
+        if quantize:
+            quantized_path = model_dir / "model.int8.onnx"
+            if not quantized_path.exists():
+                from onnxruntime.quantization import quantize_dynamic, QuantType
+                # Workers may start together; a half-written model must never
+                # be visible under the final name
+                tmp = quantized_path.with_name(f"{quantized_path.name}.tmp{os.getpid()}")
+                try:
+                    quantize_dynamic(str(model_path), str(tmp), weight_type=QuantType.QInt8)
+                    os.replace(tmp, quantized_path)
+                finally:
+                    tmp.unlink(missing_ok=True)
+            model_path = quantized_path
+            self.name = "onnx-int8"
+
+        options = ort.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            if inter_op_threads > 1:
+                options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        self.pooling, self.normalize = self._read_sentence_transformers_config(model_dir)
+
+    @staticmethod
+    def _read_sentence_transformers_config(model_dir):
+        """Match the pooling/normalization of the sentence-transformers model"""
+        pooling, normalize = "mean", False
+
+        modules_path = model_dir / "modules.json"
+        if modules_path.exists():
+            modules = json.loads(modules_path.read_text(encoding="utf-8"))
+            normalize = any(m.get("type", "").endswith("Normalize") for m in modules)
+
+        pooling_path = model_dir / "1_Pooling" / "config.json"
+        if pooling_path.exists():
+            config = json.loads(pooling_path.read_text(encoding="utf-8"))
+            if config.get("pooling_mode_cls_token"):
+                pooling = "cls"
+
+        return pooling, normalize
+
+    def _embed(self, texts):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        hidden = self.session.run(None, feeds)[0]
+
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+        return pooled.tolist()
+
+
+class StubEmbeddingBackend(EmbeddingBackend):
+    """Deterministic hashed bag-of-words vectors, no model needed.
+
+    For tests and load runs only; an index built with it is not compatible
+    with the real model.
+    """
+
+    name = "stub"
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self, dim=384, batch_size=EMBEDDING_BATCH_SIZE):
+        super().__init__(batch_size)
+        self.dim = dim
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in self.TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _embed(self, texts):
+        return [self._vector(t) for t in texts]
+
+
+def build_embeddings(backend=EMBEDDING_BACKEND):
+    if backend == "sentence-transformers":
+        return SentenceTransformerBackend()
+    if backend == "onnx":
+        return OnnxEmbeddingBackend()
+    if backend == "stub":
+        return StubEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,202 @@
+import math
+import re
+import time
+
+from langchain_community.llms import Ollama
+
+from app.prompt import SYSTEM_PROMPT_TEMPLATE, QUESTION_PROMPT_TEMPLATE
+from app.config import (
+    LLM_MODEL, LLM_BASE_URL, LLM_NUM_CTX, LLM_PROMPT_FORMAT, LLM_TOKENS_PER_WORD,
+    LLM_KEEP_ALIVE, MAX_ANSWER_WORDS, MAX_CITATIONS_PER_ANSWER, REASONING_MODE,
+    REASONING_MAX_TOKENS
+)
+
+REASONING_MODES = ("keep", "truncate", "suppress")
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+THINK_BLOCK_PATTERN = re.compile(r'<think>.*?(?:</think>|$)', re.DOTALL)
+
+# deepseek-r1 chat format, used with raw=True so we control the
+# assistant prefix (and with it the <think> block)
+R1_USER = "<｜User｜>"
+R1_ASSISTANT = "<｜Assistant｜>"
+
+# Built once: every request starts with exactly these bytes
+SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.format(
+    max_words=MAX_ANSWER_WORDS,
+    max_citations=MAX_CITATIONS_PER_ANSWER
+)
+
+
+def answer_token_budget():
+    return math.ceil(MAX_ANSWER_WORDS * LLM_TOKENS_PER_WORD)
+
+
+def num_predict_budget(mode=REASONING_MODE):
+    """Ollama num_predict for the first generation call"""
+    if mode == "suppress":
+        return answer_token_budget()
+    return answer_token_budget() + REASONING_MAX_TOKENS
+
+
+def uses_raw_prompt():
+    return LLM_PROMPT_FORMAT == "deepseek-r1"
+
+
+def build_llm(base_url=LLM_BASE_URL):
+    if REASONING_MODE not in REASONING_MODES:
+        raise ValueError(f"Unknown reasoning mode: {REASONING_MODE}")
+
+    return Ollama(
+        model=LLM_MODEL,
+        base_url=base_url,
+        temperature=0,
+        num_predict=num_predict_budget(),
+        num_ctx=LLM_NUM_CTX,
+        raw=uses_raw_prompt() or None,
+        # Raw prompts carry the system prefix themselves (format_prompt)
+        system=None if uses_raw_prompt() else SYSTEM_PROMPT,
+        keep_alive=LLM_KEEP_ALIVE
+    )
+
+
+def format_prompt(prompt, mode=REASONING_MODE):
+    """Return (prompt to send, whether the output starts inside <think>)"""
+    if not uses_raw_prompt():
+        return prompt, False
+
+    # r1 places the system prompt before the first user turn
+    raw = f"{SYSTEM_PROMPT}{R1_USER}{prompt}{R1_ASSISTANT}"
+    if mode == "suppress":
+        # An empty, already closed reasoning block makes r1 answer directly
+        return raw + f"{THINK_OPEN}\n\n{THINK_CLOSE}\n\n", False
+    return raw + f"{THINK_OPEN}\n", True
+
+
+def strip_reasoning(text):
+    text = THINK_BLOCK_PATTERN.sub('', text)
+    if THINK_CLOSE in text:
+        # Reasoning was opened by the template, only the closing tag is in the output
+        text = text.split(THINK_CLOSE, 1)[1]
+    return text.strip()
+
+
+class ReasoningStreamFilter:
+    """Splits streamed tokens into visible answer text and reasoning.
+
+    Tags can arrive split across tokens, so a possible partial tag at the
+    end of the input is held back until the next token decides it.
+    """
+
+    def __init__(self, in_reasoning=False):
+        self.in_reasoning = in_reasoning
+        self.pending = ""
+        self.reasoning = []
+        self.reasoning_tokens = 0
+        self._answer_started = False
+
+    def _emit(self, text, visible):
+        if not text:
+            return
+        if self.in_reasoning:
+            self.reasoning.append(text)
+            return
+        if not self._answer_started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._answer_started = True
+        visible.append(text)
+
+    @staticmethod
+    def _partial_tag_length(text, tag):
+        for n in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:n]):
+                return n
+        return 0
+
+    def feed(self, token):
+        if self.in_reasoning:
+            self.reasoning_tokens += 1
+
+        self.pending += token
+        visible = []
+
+        while self.pending:
+            tag = THINK_CLOSE if self.in_reasoning else THINK_OPEN
+            i = self.pending.find(tag)
+            if i >= 0:
+                self._emit(self.pending[:i], visible)
+                self.pending = self.pending[i + len(tag):]
+                self.in_reasoning = not self.in_reasoning
+                continue
+
+            keep = self._partial_tag_length(self.pending, tag)
+            self._emit(self.pending[:len(self.pending) - keep], visible)
+            self.pending = self.pending[len(self.pending) - keep:]
+            break
+
+        return "".join(visible)
+
+    def flush(self):
+        visible = []
+        self._emit(self.pending, visible)
+        self.pending = ""
+        return "".join(visible)
+
+
+def _filtered(stream, filt, truncate_at=None):
+    """Yield visible text; stop once reasoning reaches truncate_at tokens"""
+    try:
+        for token in stream:
+            visible = filt.feed(token)
+            if visible:
+                yield visible
+            if truncate_at and filt.in_reasoning and filt.reasoning_tokens >= truncate_at:
+                return
+    finally:
+        stream.close()
+
+
+def stream_answer(llm, prompt, mode=REASONING_MODE):
+    """Stream the visible part of the answer, without reasoning blocks.
+
+    In "truncate" mode the reasoning is cut after REASONING_MAX_TOKENS: the
+    stream is closed and generation continues from the partial reasoning
+    with a forced </think>, capped at the answer budget.
+    """
+    raw_prompt, in_reasoning = format_prompt(prompt, mode)
+    truncate = mode == "truncate" and uses_raw_prompt()
+
+    filt = ReasoningStreamFilter(in_reasoning)
+    yield from _filtered(
+        llm.stream(raw_prompt), filt,
+        truncate_at=REASONING_MAX_TOKENS if truncate else None
+    )
+
+    if truncate and filt.in_reasoning and filt.reasoning_tokens >= REASONING_MAX_TOKENS:
+        print(f"\n=== DEBUG REASONING TRUNCATED at {filt.reasoning_tokens} tokens ===")
+        reasoning = "".join(filt.reasoning) + filt.pending
+        continuation = f"{raw_prompt}{reasoning}\n{THINK_CLOSE}\n\n"
+
+        filt = ReasoningStreamFilter(False)
+        yield from _filtered(
+            llm.stream(continuation, num_predict=answer_token_budget()), filt
+        )
+
+    tail = filt.flush()
+    if tail:
+        yield tail
+
+
+def warm_up(llm, mode=REASONING_MODE):
+    """Load the model and evaluate the system prefix with a 1-token request.
+
+    Returns the seconds it took, which include the model load when the
+    backend had it unloaded.
+    """
+    prompt, _ = format_prompt(QUESTION_PROMPT_TEMPLATE.format(context="", question=""), mode)
+    start = time.perf_counter()
+    llm.invoke(prompt, num_predict=1)
+    return time.perf_counter() - start
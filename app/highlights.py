@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.loaders import write_json_gz
+from app.query_analysis import TERM_PATTERN
+
+SENTENCE_BREAK = re.compile(r'\.\s+')
+
+SNIPPET_CHARS = 200
+
+
+def doc_key(doc):
+    """Content address of a page or chunk, stable across index versions"""
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+
+
+def index_text(text):
+    """Sentence offsets plus a term -> sentence ids map for one document"""
+    offsets = []
+    start = 0
+    for m in SENTENCE_BREAK.finditer(text):
+        offsets.append([start, m.start() + 1])
+        start = m.end()
+    if start < len(text):
+        offsets.append([start, len(text)])
+
+    terms = {}
+    for sid, (s, e) in enumerate(offsets):
+        for term in set(TERM_PATTERN.findall(text[s:e].lower())):
+            terms.setdefault(term, []).append(sid)
+
+    return {"s": offsets, "t": terms}
+
+
+class SentenceIndex:
+    """Sentence-level highlight index for citation snippets.
+
+    Entries are built at ingest by build_index and loaded with the index
+    version. Documents missing from it (legacy indexes) are indexed on
+    first use and kept in a bounded LRU.
+    """
+
+    def __init__(self, entries=None, lazy_capacity=2048):
+        self.entries = entries or {}
+        self.lazy_capacity = lazy_capacity
+        self._lazy = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, doc):
+        self.entries[doc_key(doc)] = index_text(doc.page_content)
+
+    @classmethod
+    def build(cls, documents):
+        index = cls()
+        for doc in documents:
+            index.add(doc)
+        return index
+
+    def save(self, path):
+        write_json_gz(path, self.entries)
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def entry(self, doc):
+        key = doc_key(doc)
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            entry = self._lazy.get(key)
+            if entry is not None:
+                self._lazy.move_to_end(key)
+                return entry
+
+        entry = index_text(doc.page_content)
+        with self._lock:
+            self._lazy[key] = entry
+            if len(self._lazy) > self.lazy_capacity:
+                self._lazy.popitem(last=False)
+        return entry
+
+    def size(self):
+        return {"ingested": len(self.entries), "lazy": len(self._lazy)}
+
+    def snippet(self, doc, terms, max_chars=SNIPPET_CHARS):
+        """Best matching sentence for the query terms.
+
+        Returns (text, spans): plain text plus [start, end] offsets of the
+        matched terms in it, so each client can mark them its own way.
+        """
+        entry = self.entry(doc)
+        if not entry["s"]:
+            return "", []
+
+        scores = {}
+        matched = [t for t in terms if t in entry["t"]]
+        for term in matched:
+            for sid in entry["t"][term]:
+                scores[sid] = scores.get(sid, 0) + 1
+
+        best = min(scores, key=lambda sid: (-scores[sid], sid)) if scores else 0
+        start, end = entry["s"][best]
+        sentence = doc.page_content[start:end].strip()
+
+        if len(sentence) > max_chars:
+            sentence = sentence[:max_chars] + "..."
+
+        spans = []
+        if matched:
+            pattern = re.compile(
+                r'\b(' + "|".join(re.escape(t) for t in sorted(matched, key=len, reverse=True)) + r')\b',
+                re.IGNORECASE
+            )
+            spans = [[m.start(), m.end()] for m in pattern.finditer(sentence)]
+
+        return sentence, spans
@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+VERSIONS_DIRNAME = "versions"
+CURRENT_FILENAME = "CURRENT"
+MANIFEST_FILENAME = "manifest.json"
+
+
+def _versions_root(root) -> Path:
+    return Path(root) / VERSIONS_DIRNAME
+
+
+def new_version_dir(root) -> Tuple[str, Path]:
+    """Create an empty, uniquely named version directory under root/versions"""
+    base = time.strftime("%Y%m%d-%H%M%S")
+    version = base
+    suffix = 1
+
+    while (_versions_root(root) / version).exists():
+        suffix += 1
+        version = f"{base}-{suffix}"
+
+    path = _versions_root(root) / version
+    path.mkdir(parents=True)
+    return version, path
+
+
+def list_versions(root) -> list:
+    versions_root = _versions_root(root)
+    if not versions_root.exists():
+        return []
+    return sorted(p.name for p in versions_root.iterdir() if p.is_dir())
+
+
+def current_version(root) -> Optional[str]:
+    path = Path(root) / CURRENT_FILENAME
+    if not path.exists():
+        return None
+    version = path.read_text(encoding="utf-8").strip()
+    return version or None
+
+
+def version_dir(root, version: Optional[str]) -> Path:
+    """Directory holding a version; None means the legacy unversioned layout"""
+    if version is None:
+        return Path(root)
+    return _versions_root(root) / version
+
+
+def publish_version(root, version: str) -> None:
+    """Atomically point root/CURRENT at version"""
+    if not version_dir(root, version).is_dir():
+        raise FileNotFoundError(f"Index version {version} does not exist")
+
+    path = Path(root) / CURRENT_FILENAME
+    tmp = path.with_name(f"{CURRENT_FILENAME}.tmp{os.getpid()}")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def prune_versions(root, keep: int = 3) -> list:
+    """Delete the oldest versions, never touching the current one"""
+    current = current_version(root)
+    versions = list_versions(root)
+    removable = [v for v in versions[:-keep] if v != current] if keep > 0 else []
+
+    for version in removable:
+        shutil.rmtree(version_dir(root, version), ignore_errors=True)
+
+    return removable
+
+
+def write_manifest(path, manifest: dict) -> None:
+    (Path(path) / MANIFEST_FILENAME).write_text(
+        json.dumps(manifest, indent=2), encoding="utf-8"
+    )
+
+
+def read_manifest(path) -> Optional[dict]:
+    """Manifest of a version directory, None for versions built without one"""
+    manifest_path = Path(path) / MANIFEST_FILENAME
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
@@ -1,50 +1,135 @@
 import re
+import gzip
+import json
+import os
+import hashlib
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
 
+PAGE_CACHE_VERSION = 1
+
 
 def clean_text(text: str) -> str:
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
 
-def load_pdfs_with_metadata(pdf_folder: str) -> List[Document]:
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_json_gz(path, data, ensure_ascii: bool = False) -> None:
+    """Atomically write data as gzip JSON: temp file, then os.replace"""
+    path = Path(path)
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(data, f, ensure_ascii=ensure_ascii, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _cache_path(cache_dir: str, digest: str) -> Path:
+    return Path(cache_dir) / f"{digest}.json.gz"
+
+
+def read_page_cache(cache_dir: str, digest: str) -> Optional[list]:
+    """Return cached [page, text] pairs for a PDF hash, or None on miss"""
+    path = _cache_path(cache_dir, digest)
+    if not path.exists():
+        return None
+
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if payload.get("version") != PAGE_CACHE_VERSION:
+        return None
+    return payload["pages"]
+
+
+def write_page_cache(cache_dir: str, digest: str, source: str, pages: list):
+    path = _cache_path(cache_dir, digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    payload = {"version": PAGE_CACHE_VERSION, "source": source, "pages": pages}
+    write_json_gz(path, payload)
+
+
+def extract_pages(pdf_path: Path) -> list:
+    """Run PyPDFLoader + clean_text, returning non-empty [page, text] pairs"""
+    loader = PyPDFLoader(str(pdf_path))
+    pages = []
+
+    for page in loader.load():
+        text = clean_text(page.page_content)
+        if text:
+            pages.append([page.metadata.get("page", None), text])
+
+    return pages
+
+
+def load_pdfs_with_metadata(pdf_folder: str, cache_dir: Optional[str] = None) -> List[Document]:
     documents = []
+    hits = misses = 0
 
-    for pdf_path in Path(pdf_folder).glob("*.pdf"):
-        loader = PyPDFLoader(str(pdf_path))
-        pages = loader.load()
-
-        for page in pages:
-            text = clean_text(page.page_content)
-            page_number = page.metadata.get("page", None)
-
-            if not text:
-                continue
-
-            if page_number == 0:
-                documents.append(
-                    Document(
-                        page_content=text,
-                        metadata={
-                            "source": pdf_path.name,
-                            "page": page_number,
-                            "is_identity_page": True
-                        }
-                    )
-                )
-            else:
-                documents.append(
-                    Document(
-                        page_content=text,
-                        metadata={
-                            "source": pdf_path.name,
-                            "page": page_number,
-                            "is_identity_page": False
-                        }
-                    )
+    for pdf_path in sorted(Path(pdf_folder).glob("*.pdf")):
+        pages = None
+        digest = None
+
+        if cache_dir:
+            digest = file_sha256(pdf_path)
+            pages = read_page_cache(cache_dir, digest)
+
+        if pages is None:
+            pages = extract_pages(pdf_path)
+            misses += 1
+            if cache_dir:
+                write_page_cache(cache_dir, digest, pdf_path.name, pages)
+        else:
+            hits += 1
+
+        for page_number, text in pages:
+            documents.append(
+                Document(
+                    page_content=text,
+                    metadata={
+                        "source": pdf_path.name,
+                        "page": page_number,
+                        "is_identity_page": page_number == 0
+                    }
                 )
+            )
+
+    if cache_dir:
+        print(f" Page cache: {hits} hit, {misses} extracted")
 
     return documents
+
+
+def save_documents(documents: List[Document], path) -> None:
+    """Write a gzip JSON snapshot of documents (used for per-version BM25 corpora)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    payload = [
+        {"page_content": doc.page_content, "metadata": doc.metadata}
+        for doc in documents
+    ]
+    write_json_gz(path, payload)
+
+
+def load_documents(path) -> List[Document]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        payload = json.load(f)
+
+    return [
+        Document(page_content=item["page_content"], metadata=item["metadata"])
+        for item in payload
+    ]
@@ -1,7 +1,19 @@
-from fastapi import FastAPI, HTTPException
+import hmac
+import json
+
+from fastapi import FastAPI, HTTPException, Header, Depends, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 
-from app.rag import ask 
+from app.rag import (
+    ask, ask_stream, reload_index, rebuild_index_async, get_index_info, get_embedding_stats,
+    get_memory_stats
+)
+from app.config import ADMIN_TOKEN
+from app.rules import reload_rules
+from app.profiling import (
+    run_profiled, should_profile, profile_next, list_profiles, profile_paths
+)
 
 app = FastAPI(
     title="Indo RAG API",
@@ -17,6 +29,9 @@ class AskRequest(BaseModel):
 class Source(BaseModel):
     document: str
     page: int | str
+    snippet: str | None = None
+    # [start, end] offsets of the query terms within snippet
+    highlights: list[list[int]] = []
 
 
 class AskResponse(BaseModel):
@@ -25,6 +40,26 @@ class AskResponse(BaseModel):
 
 
 
+class ReloadRequest(BaseModel):
+    version: str | None = None
+
+
+class ProfileRequest(BaseModel):
+    next_requests: int = 1
+
+
+def is_admin(token):
+    # No configured token means admin features are off, not open
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
 # Health Check
 
 @app.get("/health")
@@ -35,14 +70,114 @@ def health_check():
 # RAG Endpoint
 
 @app.post("/ask", response_model=AskResponse)
-def ask_question(req: AskRequest):
+def ask_question(
+    req: AskRequest,
+    response: Response,
+    x_profile: str | None = Header(default=None),
+    x_admin_token: str | None = Header(default=None)
+):
     question = req.q.strip()
 
     if not question:
         raise HTTPException(status_code=400, detail="Question cannot be empty")
-    result = ask(question)
+
+    # Profiling via header is an admin feature
+    requested = bool(x_profile) and is_admin(x_admin_token)
+
+    if should_profile(requested):
+        result, session = run_profiled(ask, question, label=question[:80])
+        response.headers["X-Profile-Id"] = session.id
+    else:
+        result = ask(question)
+
     return AskResponse(
         answer=result["answer"],
         sources=result["sources"]
     )
 
+
+@app.post("/ask/stream")
+def ask_question_stream(req: AskRequest):
+    """ask_stream() events as newline-delimited JSON, one event per line"""
+    question = req.q.strip()
+
+    if not question:
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    def lines():
+        for event in ask_stream(question):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Index Admin
+
+@app.get("/admin/index", dependencies=[Depends(require_admin)])
+def index_info():
+    return get_index_info()
+
+
+@app.post("/admin/index/reload", dependencies=[Depends(require_admin)])
+def index_reload(req: ReloadRequest | None = None):
+    try:
+        return reload_index(req.version if req else None)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.post("/admin/index/rebuild", status_code=202, dependencies=[Depends(require_admin)])
+def index_rebuild():
+    return rebuild_index_async()
+
+
+# Rules
+
+@app.post("/admin/rules/reload", dependencies=[Depends(require_admin)])
+def rules_reload():
+    try:
+        return reload_rules().size()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Rules file not loaded: {e}")
+
+
+# Embeddings
+
+@app.get("/debug/embeddings", dependencies=[Depends(require_admin)])
+def embedding_stats():
+    return get_embedding_stats()
+
+
+# Memory
+
+@app.get("/debug/memory", dependencies=[Depends(require_admin)])
+def memory_stats():
+    return get_memory_stats()
+
+
+# Profiling
+
+@app.post("/admin/profiling", dependencies=[Depends(require_admin)])
+def profiling_enable(req: ProfileRequest):
+    return {"profile_next_requests": profile_next(req.next_requests)}
+
+
+@app.get("/debug/profiles", dependencies=[Depends(require_admin)])
+def profiles():
+    return list_profiles()
+
+
+@app.get("/debug/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def profile_summary(profile_id: str):
+    paths = profile_paths(profile_id)
+    if not paths:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(paths[0], media_type="application/json")
+
+
+@app.get("/debug/profiles/{profile_id}/download", dependencies=[Depends(require_admin)])
+def profile_download(profile_id: str):
+    paths = profile_paths(profile_id)
+    if not paths or paths[1] is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(paths[1], media_type="application/octet-stream", filename=f"{profile_id}.prof")
@@ -0,0 +1,157 @@
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from app.config import MEMORY_TRACE, MEMORY_TRACE_FRAMES, MEMORY_TRACE_TOP
+
+MB = 1024 * 1024
+
+_lock = threading.Lock()
+_phase = {"name": "startup"}
+_steps = {"startup": {}}
+_caches = {}
+
+# The snapshots themselves should not show up in the numbers
+_SELF_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No procfs: fall back to peak RSS (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def start_tracing():
+    """Trace Python allocations for the startup steps (MEMORY_TRACE)"""
+    if MEMORY_TRACE and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+
+
+def finish_startup():
+    """End the startup phase and stop tracemalloc; later steps record RSS only"""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _phase["name"] = "runtime"
+
+
+@contextmanager
+def phase(name):
+    """Record the steps of a later (re)initialization under their own name"""
+    with _lock:
+        _steps[name] = {}
+        previous, _phase["name"] = _phase["name"], name
+    try:
+        yield
+    finally:
+        _phase["name"] = previous
+
+
+def _record(name, entry):
+    with _lock:
+        steps = _steps.setdefault(_phase["name"], {})
+        existing = steps.get(name)
+        if existing is None:
+            steps[name] = entry
+            return
+        # Repeated steps (one per shard) add up
+        existing["calls"] += 1
+        existing["seconds"] += entry["seconds"]
+        existing["rss_delta_mb"] += entry["rss_delta_mb"]
+        if "tracing_overhead_mb" in entry:
+            existing["tracing_overhead_mb"] = existing.get("tracing_overhead_mb", 0.0) + entry["tracing_overhead_mb"]
+        if "python_delta_mb" in entry:
+            existing["python_delta_mb"] = existing.get("python_delta_mb", 0.0) + entry["python_delta_mb"]
+            existing["top_allocations"] = entry["top_allocations"]
+
+
+@contextmanager
+def measure(name):
+    """RSS delta around a step, plus a tracemalloc snapshot diff while tracing.
+
+    RSS includes native allocations (torch, onnxruntime, sqlite) that
+    tracemalloc cannot see; the Python delta shows what the interpreter
+    itself holds. While tracing, tracemalloc's own per-allocation
+    bookkeeping also lands in RSS, so traced steps are marked
+    rss_includes_tracing; tracing_overhead_mb is the part tracemalloc
+    accounts for itself and understates the real overhead.
+    """
+    tracing = tracemalloc.is_tracing()
+    before = tracemalloc.take_snapshot().filter_traces(_SELF_FILTERS) if tracing else None
+    overhead_before = tracemalloc.get_tracemalloc_memory() if tracing else 0
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+
+    yield
+
+    entry = {
+        "calls": 1,
+        "seconds": time.perf_counter() - start,
+        "rss_delta_mb": (rss_bytes() - rss_before) / MB
+    }
+    if tracing and tracemalloc.is_tracing():
+        entry["rss_includes_tracing"] = True
+        entry["tracing_overhead_mb"] = (tracemalloc.get_tracemalloc_memory() - overhead_before) / MB
+        after = tracemalloc.take_snapshot().filter_traces(_SELF_FILTERS)
+        diff = after.compare_to(before, "filename")
+        entry["python_delta_mb"] = sum(d.size_diff for d in diff) / MB
+        entry["top_allocations"] = [
+            {"file": d.traceback[0].filename, "size_mb": d.size_diff / MB, "blocks": d.count_diff}
+            for d in diff[:MEMORY_TRACE_TOP]
+            if d.size_diff > 0
+        ]
+    _record(name, entry)
+
+
+def register_cache(name, size_fn):
+    """size_fn() returns the live size of a cache (a number or a dict)"""
+    _caches[name] = size_fn
+
+
+def cache_sizes():
+    sizes = {}
+    for name, size_fn in _caches.items():
+        try:
+            sizes[name] = size_fn()
+        except Exception as e:
+            sizes[name] = {"error": str(e)}
+    return sizes
+
+
+def memory_report():
+    with _lock:
+        steps = {p: {n: dict(e) for n, e in s.items()} for p, s in _steps.items()}
+
+    largest = sorted(
+        ((p, n, e["rss_delta_mb"]) for p, s in steps.items() for n, e in s.items()),
+        key=lambda item: item[2], reverse=True
+    )
+    traced = any(e.get("rss_includes_tracing") for s in steps.values() for e in s.values())
+    return {
+        "rss_mb": rss_bytes() / MB,
+        "peak_rss_mb": peak_rss_bytes() / MB,
+        "tracing": tracemalloc.is_tracing(),
+        "rss_note": (
+            "Steps marked rss_includes_tracing were measured under tracemalloc; their RSS "
+            "deltas include its bookkeeping, which tracing_overhead_mb only partly accounts for. "
+            "Restart with MEMORY_TRACE off for production numbers."
+        ) if traced else None,
+        "steps": steps,
+        "largest_steps": [{"phase": p, "step": n, "rss_delta_mb": d} for p, n, d in largest[:5]],
+        "caches": cache_sizes()
+    }
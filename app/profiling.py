@@ -0,0 +1,252 @@
+import cProfile
+import contextvars
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from app.config import PROFILE_DIR, PROFILE_KEEP
+
+_active = contextvars.ContextVar("profile_session", default=None)
+
+_pending_lock = threading.Lock()
+_pending = {"remaining": 0}
+
+# From Python 3.12 cProfile runs on sys.monitoring: only one profiler can
+# be enabled per interpreter, and it already sees every thread
+PER_THREAD_PROFILERS = sys.version_info < (3, 12)
+_profiler_lock = threading.Lock()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.session.stages.append({
+            "name": self.name,
+            "seconds": time.perf_counter() - self.start
+        })
+        return False
+
+
+def stage(name):
+    """Time a pipeline stage when the current request is being profiled.
+
+    Without an active session this returns a shared no-op context manager,
+    so unprofiled requests only pay for one ContextVar lookup.
+    """
+    session = _active.get()
+    if session is None:
+        return _NULL_STAGE
+    return _Stage(session, name)
+
+
+def propagate(fn):
+    """Carry the active session into a worker thread (thread pool tasks).
+
+    Before Python 3.12 cProfile only sees the thread it was enabled in, so
+    each task gets its own profiler that is merged into the session when it
+    finishes. On 3.12+ the session's profiler covers the worker thread and
+    only the session (for stage timings) is carried over.
+
+    Long-lived threads that serve many requests, such as the embedding
+    batcher, are not started through here: before 3.12 their work is
+    missing from the cProfile output and only shows up as the caller's
+    "embed_query" stage.
+    """
+    session = _active.get()
+    if session is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _active.set(session)
+        profiler = None
+        if PER_THREAD_PROFILERS and session.profiler is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                session.add_thread_profile(profiler)
+            _active.reset(token)
+
+    return run
+
+
+class ProfileSession:
+    def __init__(self, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.created = time.time()
+        self.stages = []
+        self.total_seconds = None
+        self.profiler = cProfile.Profile()
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+
+    def add_thread_profile(self, profiler):
+        with self._lock:
+            self._thread_profiles.append(profiler)
+
+    def stats(self, stream=None):
+        """pstats for the session, None when it ran with stage timings only"""
+        if self.profiler is None:
+            return None
+        stats = pstats.Stats(self.profiler, stream=stream)
+        for profiler in self._thread_profiles:
+            stats.add(profiler)
+        return stats
+
+    def summary(self, limit=30):
+        out = io.StringIO()
+        stats = self.stats(stream=out)
+        if stats is not None:
+            stats.sort_stats("cumulative").print_stats(limit)
+
+        return {
+            "id": self.id,
+            "label": self.label,
+            "created": self.created,
+            "total_seconds": self.total_seconds,
+            "stages": self.stages,
+            "profiled": stats is not None,
+            "threads_profiled": 1 + len(self._thread_profiles) if stats is not None else 0,
+            "top_functions": out.getvalue() if stats is not None else None
+        }
+
+    def save(self, directory=PROFILE_DIR):
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+
+        stats = self.stats()
+        if stats is not None:
+            stats.dump_stats(str(path / f"{self.id}.prof"))
+        (path / f"{self.id}.json").write_text(
+            json.dumps(self.summary(), indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        _prune(path)
+
+
+def _prune(path, keep=PROFILE_KEEP):
+    summaries = sorted(path.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in summaries[:-keep] if keep > 0 else []:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def _enable_profiler(session):
+    """Enable the session's profiler; False leaves it with stage timings only"""
+    if not PER_THREAD_PROFILERS and not _profiler_lock.acquire(blocking=False):
+        # Another profiled request owns the interpreter's profiler
+        session.profiler = None
+        return False
+
+    try:
+        session.profiler.enable()
+    except ValueError:
+        # Another profiling tool is already active
+        if not PER_THREAD_PROFILERS:
+            _profiler_lock.release()
+        session.profiler = None
+        return False
+    return True
+
+
+def _disable_profiler(session):
+    session.profiler.disable()
+    if not PER_THREAD_PROFILERS:
+        _profiler_lock.release()
+
+
+def run_profiled(fn, *args, label=None, **kwargs):
+    """Call fn under cProfile; returns (result, session) and stores the profile.
+
+    Only one request is profiled at a time on Python 3.12+; a request that
+    overlaps with it records its stage timings without a profile.
+    """
+    session = ProfileSession(label)
+    token = _active.set(session)
+    start = time.perf_counter()
+    profiling = _enable_profiler(session)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        if profiling:
+            _disable_profiler(session)
+        session.total_seconds = time.perf_counter() - start
+        _active.reset(token)
+        session.save()
+
+    return result, session
+
+
+def profile_next(count):
+    """Admin flag: profile the next `count` requests regardless of headers"""
+    with _pending_lock:
+        _pending["remaining"] = max(0, int(count))
+        return _pending["remaining"]
+
+
+def should_profile(requested=False):
+    if requested:
+        return True
+    if not _pending["remaining"]:
+        return False
+
+    with _pending_lock:
+        if _pending["remaining"] > 0:
+            _pending["remaining"] -= 1
+            return True
+    return False
+
+
+def list_profiles(directory=PROFILE_DIR):
+    path = Path(directory)
+    if not path.exists():
+        return []
+
+    profiles = []
+    for summary in sorted(path.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True):
+        data = json.loads(summary.read_text(encoding="utf-8"))
+        profiles.append({
+            "id": data["id"],
+            "label": data["label"],
+            "created": data["created"],
+            "total_seconds": data["total_seconds"]
+        })
+    return profiles
+
+
+def profile_paths(profile_id, directory=PROFILE_DIR):
+    """(summary json, pstats dump) for an id, or None if unknown"""
+    if not profile_id.isalnum():
+        return None
+    summary = Path(directory) / f"{profile_id}.json"
+    if not summary.exists():
+        return None
+    dump = summary.with_suffix(".prof")
+    # Stage-timing-only sessions have no pstats dump
+    return summary, dump if dump.exists() else None
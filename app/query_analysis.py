@@ -0,0 +1,89 @@
+import re
+
+from app.rules import get_rules
+
+# All query-side patterns are compiled once at import
+REGULATION_PATTERN = re.compile(
+    r'(pojk|seojk|uu)\s*(?:no\.|nomor)?\s*(\d+)\s*(?:tahun|/)?\s*(\d{4})',
+    re.IGNORECASE
+)
+REGULATION_MENTION_PATTERN = re.compile(r'(pojk|seojk|uu)\s*(nomor\s*)?\d+')
+SPECIFIC_REGULATION_PATTERN = re.compile(r'(pojk|seojk|uu)\s*\d+')
+YEAR_PATTERN = re.compile(r'(tahun\s+)?(20\d{2})')
+PASAL_PATTERN = re.compile(r'pasal\s+(\d+[a-z]?)')
+TERM_PATTERN = re.compile(r'\w{2,}')
+
+DEFINITION_MARKERS = ("apa yang dimaksud", "apa itu", "pengertian")
+
+TYPE_HINTS = (
+    ("UU", ("undang-undang", "uu ", "uu:")),
+    ("POJK", ("pojk", "peraturan ojk")),
+    ("SEOJK", ("seojk", "surat edaran")),
+)
+
+# Topic-priority and boost rules live in the rules file (app/rules.py)
+
+IMPORTANT_TERMS = [
+    "pasal", "ayat", "huruf", "angka",
+    "ketentuan", "peraturan", "undang-undang",
+    "bank", "risiko", "modal", "likuiditas"
+]
+
+
+class QueryAnalysis:
+    """Everything the pipeline needs to know about a question, computed once.
+
+    ask() builds one per request and passes it to the retriever, reranker,
+    context builder, confidence and snippet steps.
+    """
+
+    def __init__(self, question: str):
+        self.question = question
+        self.lower = question.lower()
+        self.tokens = self.lower.split()
+        self.token_set = set(self.tokens)
+        # Punctuation-free terms for the sentence highlight index
+        self.terms = sorted(set(TERM_PATTERN.findall(self.lower)))
+
+        # Full "TYPE NUM TAHUN YEAR" reference used for the strict lock
+        self.regulation = None
+        m = REGULATION_PATTERN.search(question)
+        if m:
+            reg_type, num, year = m.groups()
+            reg_type = reg_type.upper()
+            num = str(int(num))
+            self.regulation = {
+                "type": reg_type,
+                "number": num,
+                "year": year,
+                "expected_filename": f"{reg_type}_{num}_{year}"
+            }
+
+        # Partial "TYPE NUM" mention used by the reranker name match
+        m = REGULATION_MENTION_PATTERN.search(self.lower)
+        self.regulation_mention = m.group(0).upper().replace('NOMOR', '').strip() if m else None
+
+        m = YEAR_PATTERN.search(self.lower)
+        self.year = int(m.group(2)) if m else None
+
+        m = PASAL_PATTERN.search(self.lower)
+        self.pasal = m.group(1) if m else None
+        self.has_pasal = 'pasal' in self.lower
+        self.has_specific_regulation = bool(SPECIFIC_REGULATION_PATTERN.search(self.lower))
+
+        self.is_definition = any(k in self.lower for k in DEFINITION_MARKERS)
+
+        self.type_hint = None
+        for reg_type, hints in TYPE_HINTS:
+            if any(h in self.lower for h in hints):
+                self.type_hint = reg_type
+                break
+
+        # One automaton pass over the query for all topic and boost rules
+        self.topics, self.priority_docs, self.topic_boosts = get_rules().match(self.lower)
+
+        self.important_terms = [t for t in IMPORTANT_TERMS if t in self.lower]
+
+
+def analyze_query(question: str) -> QueryAnalysis:
+    return QueryAnalysis(question)
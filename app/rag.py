@@ -1,39 +1,351 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_community.llms import Ollama
-import re
-
-from app.loaders import load_pdfs_with_metadata
+import threading
+import time
+from pathlib import Path
+
+from app.loaders import load_pdfs_with_metadata, load_documents
+from app.embeddings import build_embeddings
+from app.embedding_batcher import BatchingEmbeddings
+from app.highlights import SentenceIndex
 from app.retriever import HybridRetriever
 from app.reranker import AdvancedReranker
 from app.strict_context import StrictRegulationContextBuilder
-from app.prompt import ADVANCED_PROMPT_TEMPLATE
-from app.config import CHROMA_DIR, PDF_DIR, TOP_K
-
-# Initialize embeddings
-embeddings = HuggingFaceEmbeddings(
-    model_name="LazarusNLP/all-indo-e5-small-v4",
-    model_kwargs={'device':'cpu'}
+from app.query_analysis import analyze_query
+from app.profiling import stage
+from app.rules import get_rules
+from app import memory
+from app.dedup import doc_sources, attributed_ref, other_refs
+from app.prompt import QUESTION_PROMPT_TEMPLATE, STRICT_CITATION_RETRY_NOTE
+from app.generation import build_llm, stream_answer, strip_reasoning, warm_up
+from app.citation_guard import (
+    CITATION_PATTERN, StreamingCitationValidator, available_sources, is_available
 )
-
-# Initialize vectorstore
-vectorstore = Chroma(
-    persist_directory=CHROMA_DIR,
-    embedding_function=embeddings
+from app.index_versions import current_version, list_versions, version_dir, read_manifest
+from app.shards import ShardedRetriever, group_by_shard, UNSHARDED_KEY
+from app.config import (
+    CHROMA_DIR, PDF_DIR, PAGE_CACHE_DIR, TOP_K, INDEX_WATCH_INTERVAL,
+    RETRIEVAL_CONCURRENT, RETRIEVAL_FUSION, ENABLE_CITATION_VALIDATION,
+    CITATION_STREAM_RETRY, LLM_WARMUP
 )
 
-# Load documents
-docs = load_pdfs_with_metadata(PDF_DIR)
+memory.start_tracing()
+
+# Initialize embeddings (backend from config)
+with memory.measure("embeddings"):
+    embeddings = build_embeddings()
+
+# Queries from concurrent requests share forward passes; ingest uses
+# `embeddings` directly
+query_embeddings = BatchingEmbeddings(embeddings)
+
+
+def _chroma_systems(vectorstores):
+    systems = {}
+    for vectorstore in vectorstores.values():
+        system = getattr(getattr(vectorstore, "_client", None), "_system", None)
+        if system is not None:
+            systems[id(system)] = system
+    return systems
+
+
+def release_chroma(vectorstores, keep=()):
+    """Stop the Chroma systems behind vectorstores and drop them from chromadb's cache.
+
+    chromadb keeps one System per persist directory at class level, so a
+    swapped-out version stays resident until this is called. Systems also
+    used by `keep` (the active state) are left alone.
+    """
+    systems = _chroma_systems(vectorstores)
+    for key in _chroma_systems(keep):
+        systems.pop(key, None)
+    if not systems:
+        return 0
+
+    try:
+        from chromadb.api.shared_system_client import SharedSystemClient
+        cache = SharedSystemClient._identifier_to_system
+    except (ImportError, AttributeError):
+        # Older chromadb without the shared system cache
+        cache = {}
+    for identifier, system in list(cache.items()):
+        if id(system) in systems:
+            cache.pop(identifier, None)
+
+    for system in systems.values():
+        try:
+            system.stop()
+        except Exception as e:
+            print(f" Chroma stop failed: {e}")
+    return len(systems)
+
+
+class IndexState:
+    """Everything that belongs to one index version.
+
+    ask() takes a reference to the active state once, so a swap never
+    changes the index under a request that is already running. A state
+    that was swapped out is closed (its Chroma systems released) once the
+    last request using it is done.
+    """
+
+    def __init__(self, version, vectorstores, docs, retriever, sharding=None, highlights=None):
+        self.version = version
+        self.vectorstores = vectorstores
+        self.docs = docs
+        self.retriever = retriever
+        self.sharding = sharding
+        self.highlights = highlights or SentenceIndex()
+        self.loaded_at = time.time()
+        self.users = 0
+        self.retired = False
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self.users += 1
+
+    def release(self):
+        with self._lock:
+            self.users -= 1
+            close = self.retired and self.users == 0 and not self.closed
+            self.closed = self.closed or close
+        if close:
+            self._close()
+
+    def retire(self):
+        with self._lock:
+            self.retired = True
+            close = self.users == 0 and not self.closed
+            self.closed = self.closed or close
+        if close:
+            self._close()
+
+    def _close(self):
+        stopped = release_chroma(self.vectorstores, keep=_index_state.vectorstores)
+        _retired_states.discard(self)
+        _released["versions"] += 1
+        _released["systems"] += stopped
+        print(f" Index version {self.version} released ({stopped} Chroma systems stopped)")
+
+
+def _hybrid_retriever(vectorstore, docs):
+    # Tokenizes the pages and builds the BM25 tables
+    with memory.measure("index.bm25"):
+        return HybridRetriever(
+            vectorstore, docs, k=TOP_K,
+            concurrent=RETRIEVAL_CONCURRENT,
+            fusion=RETRIEVAL_FUSION
+        )
+
+
+def load_index_state(version=None):
+    path = version_dir(CHROMA_DIR, version)
+    manifest = read_manifest(path) if version is not None else None
+
+    if version is None:
+        # Legacy layout: Chroma directly in CHROMA_DIR, pages from the PDFs
+        with memory.measure("index.chroma"):
+            vectorstore = Chroma(
+                persist_directory=CHROMA_DIR,
+                embedding_function=query_embeddings
+            )
+        with memory.measure("index.docs"):
+            docs = load_pdfs_with_metadata(PDF_DIR, cache_dir=PAGE_CACHE_DIR)
+        return IndexState(version, {UNSHARDED_KEY: vectorstore}, docs, _hybrid_retriever(vectorstore, docs))
+
+    with memory.measure("index.docs"):
+        docs = load_documents(path / "pages.json.gz")
+    with memory.measure("index.highlights"):
+        highlights = SentenceIndex.load(path / "sentences.json.gz")
+
+    if manifest is None:
+        # Version built before sharding: single default collection
+        with memory.measure("index.chroma"):
+            vectorstore = Chroma(
+                persist_directory=str(path / "chroma"),
+                embedding_function=query_embeddings
+            )
+        return IndexState(
+            version, {UNSHARDED_KEY: vectorstore}, docs,
+            _hybrid_retriever(vectorstore, docs), highlights=highlights
+        )
+
+    sharding = manifest["sharding"]
+    pages_by_shard = group_by_shard(docs, sharding)
+    vectorstores = {}
+    retrievers = {}
+
+    for key, info in manifest["shards"].items():
+        with memory.measure("index.chroma"):
+            vectorstores[key] = Chroma(
+                persist_directory=str(path / "chroma"),
+                collection_name=info["collection"],
+                embedding_function=query_embeddings
+            )
+        retrievers[key] = _hybrid_retriever(vectorstores[key], pages_by_shard.get(key, []))
+
+    if len(retrievers) == 1:
+        retriever = next(iter(retrievers.values()))
+    else:
+        retriever = ShardedRetriever(retrievers, sharding, k=TOP_K)
+
+    return IndexState(version, vectorstores, docs, retriever, sharding, highlights)
+
+
+# Initialize index (vectorstore + BM25 documents)
+_index_state = load_index_state(current_version(CHROMA_DIR))
+_swap_lock = threading.Lock()
+# Guards reading + acquiring the active state against a concurrent swap
+_state_lock = threading.Lock()
+_retired_states = set()
+_released = {"versions": 0, "systems": 0}
+_rebuild_lock = threading.Lock()
+_rebuild_status = {"running": False, "version": None, "error": None}
 
 # Initialize components
-reranker = AdvancedReranker()
-context_builder = StrictRegulationContextBuilder()
-retriever = HybridRetriever(vectorstore, docs, k=TOP_K)
+with memory.measure("reranker"):
+    reranker = AdvancedReranker()
+    context_builder = StrictRegulationContextBuilder()
+
+# Initialize LLM (output budget and reasoning mode from config)
+with memory.measure("llm"):
+    llm = build_llm()
+
+
+def _warm_llm():
+    try:
+        print(f" LLM warm ({warm_up(llm):.1f}s)")
+    except Exception as e:
+        print(f" LLM warm-up failed: {e}")
+
+
+if LLM_WARMUP:
+    # In the background so startup does not wait for the model load
+    threading.Thread(target=_warm_llm, name="llm-warmup", daemon=True).start()
+
+memory.finish_startup()
+
+
+def get_index_state():
+    return _index_state
+
+
+def acquire_index_state():
+    """The active state, held open until release() is called on it"""
+    with _state_lock:
+        state = _index_state
+        state.acquire()
+    return state
 
-# Initialize LLM
-llm = Ollama(model="deepseek-r1:latest", temperature=0)
 
-def calculate_confidence(selected_docs, query):
+def reload_index(version=None):
+    """Switch to version (default: the one published in CURRENT)"""
+    global _index_state
+
+    with _swap_lock:
+        target = version or current_version(CHROMA_DIR)
+        # Only names of existing versions; never join arbitrary input into a path
+        if target is not None and target not in list_versions(CHROMA_DIR):
+            raise FileNotFoundError(f"Index version {target} does not exist")
+        previous = _index_state.version
+
+        if target == previous:
+            return {"switched": False, "version": previous}
+
+        with memory.phase("reload"):
+            new_state = load_index_state(target)
+        with _state_lock:
+            old_state, _index_state = _index_state, new_state
+            _retired_states.add(old_state)
+        old_state.retire()
+
+    print(f" Index switched: {previous} -> {target}")
+    return {"switched": True, "version": target, "previous": previous}
+
+
+def _run_rebuild():
+    from app.build_index import build_index
+
+    try:
+        version = build_index(embeddings=embeddings, publish=True)
+        reload_index(version)
+        _rebuild_status.update(version=version, error=None)
+    except Exception as e:
+        _rebuild_status["error"] = str(e)
+    finally:
+        _rebuild_status["running"] = False
+        _rebuild_lock.release()
+
+
+def rebuild_index_async():
+    """Build and publish a new version in the background, then switch to it"""
+    if not _rebuild_lock.acquire(blocking=False):
+        return {"started": False, **_rebuild_status}
+
+    _rebuild_status["running"] = True
+    threading.Thread(target=_run_rebuild, name="index-rebuild", daemon=True).start()
+    return {"started": True, **_rebuild_status}
+
+
+def get_index_info():
+    return {
+        "active_version": _index_state.version,
+        "published_version": current_version(CHROMA_DIR),
+        "loaded_at": _index_state.loaded_at,
+        "num_documents": len(_index_state.docs),
+        "sharding": _index_state.sharding,
+        "shards": sorted(_index_state.vectorstores),
+        # Requests routed to each shard since this version was loaded
+        "shard_routes": dict(getattr(_index_state.retriever, "route_stats", {})),
+        "rebuild": dict(_rebuild_status)
+    }
+
+
+def _watch_index(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            if current_version(CHROMA_DIR) != _index_state.version:
+                reload_index()
+        except Exception as e:
+            print(f" Index watcher error: {e}")
+
+
+if INDEX_WATCH_INTERVAL:
+    threading.Thread(
+        target=_watch_index, args=(INDEX_WATCH_INTERVAL,),
+        name="index-watcher", daemon=True
+    ).start()
+
+
+def _docs_size():
+    docs = _index_state.docs
+    return {
+        "pages": len(docs),
+        "text_mb": sum(len(doc.page_content) for doc in docs) / memory.MB
+    }
+
+
+def _page_cache_size():
+    files = list(Path(PAGE_CACHE_DIR).glob("*.json.gz"))
+    return {"files": len(files), "disk_mb": sum(f.stat().st_size for f in files) / memory.MB}
+
+
+memory.register_cache("index_docs", _docs_size)
+memory.register_cache("highlights", lambda: _index_state.highlights.size())
+memory.register_cache("index_versions", lambda: {
+    "active": _index_state.version,
+    # Swapped out, waiting for their last request
+    "retired_open": {str(s.version): s.users for s in list(_retired_states)},
+    "released_versions": _released["versions"],
+    "released_chroma_systems": _released["systems"]
+})
+memory.register_cache("rules", lambda: get_rules().size())
+memory.register_cache("page_cache", _page_cache_size)
+memory.register_cache("embedding_batcher", query_embeddings.size)
+
+def calculate_confidence(selected_docs, query, analysis=None):
     """Calculate confidence score for the answer"""
     scores = {
         "retrieval_quality": 0.0,
@@ -56,7 +368,9 @@ def calculate_confidence(selected_docs, query):
     unique_sources = len(set(sources))
     scores["document_consistency"] = 1.0 - (unique_sources / max(len(sources), 1))
     
-    query_terms = set(query.lower().split())
+    if analysis is None:
+        analysis = analyze_query(query)
+    query_terms = analysis.token_set
     covered_terms = set()
     
     for doc, _ in selected_docs[:3]:
@@ -96,32 +410,33 @@ def calculate_confidence(selected_docs, query):
         "explanation": explanation
     }
 
-def extract_snippet(doc, query):
-    query_terms = query.lower().split()
-    sentences = doc.page_content.split('. ')
-    
-    if sentences:
-        best_sentence = max(
-            sentences,
-            key=lambda s: sum(1 for term in query_terms if term in s.lower())
-        )
-        snippet = best_sentence[:200] + "..." if len(best_sentence) > 200 else best_sentence
-    else:
-        snippet = doc.page_content[:200] + "..."
-    
-    return snippet
+def extract_snippet(doc, query, analysis=None, highlights=None):
+    """(sentence, term spans) of doc, from the index's sentence highlight index"""
+    if analysis is None:
+        analysis = analyze_query(query)
+    if highlights is None:
+        highlights = _index_state.highlights
 
+    return highlights.snippet(doc, analysis.terms)
 
-def ask(question: str):
+
+def prepare_answer(question: str):
+    """Run steps 1-6 (everything before the LLM).
+
+    Returns {"result": ...} when the question can be answered without the
+    LLM, otherwise the prompt plus the sources and confidence that are
+    already known at this point.
+    """
     print("\n=== DEBUG ASK ===")
     print("Query:", question)
 
-    # 1. REGULATION PARSER
-    REGEX = r'(pojk|seojk|uu)\s*(?:no\.|nomor)?\s*(\d+)\s*(?:tahun|/)?\s*(\d{4})'
-    query_match = re.search(REGEX, question, re.IGNORECASE)
+    # 1. QUERY ANALYSIS + REGULATION PARSER
+    with stage("query_analysis"):
+        analysis = analyze_query(question)
+    target = analysis.regulation
 
-    if not query_match:
-        return {
+    if not target:
+        return {"result": {
             "answer": "Pertanyaan tidak menyebut regulasi secara eksplisit.",
             "sources": [],
             "confidence": {"overall": 0.0},
@@ -130,12 +445,12 @@ def ask(question: str):
                 "valid": False,
                 "error": "No explicit regulation reference"
             }
-        }
+        }}
 
-    reg_type, reg_num, reg_year = query_match.groups()
-    reg_type = reg_type.upper()
-    reg_num = str(int(reg_num))  
-    expected_filename = f"{reg_type}_{reg_num}_{reg_year}"
+    reg_type = target["type"]
+    reg_num = target["number"]
+    reg_year = target["year"]
+    expected_filename = target["expected_filename"]
 
     print("\n=== DEBUG REGULATION PARSED ===")
     print("Type :", reg_type)
@@ -144,28 +459,37 @@ def ask(question: str):
     print("Expect:", expected_filename)
 
     # 2. RETRIEVAL
-    retrieved = retriever.retrieve(question)
+    state = acquire_index_state()
+    try:
+        with stage("retrieval"):
+            retrieved = state.retriever.retrieve(question, analysis=analysis)
+    finally:
+        # Only retrieval touches Chroma; docs and highlights stay usable
+        state.release()
 
     print("\n=== DEBUG RETRIEVER RAW ===")
     for i, doc in enumerate(retrieved[:10], 1):
         print(f"{i}. {doc.metadata.get('source')} | page={doc.metadata.get('page')}")
 
     # 3. RERANK
-    reranked = reranker.rerank(retrieved, query=question)
+    with stage("rerank"):
+        reranked = reranker.rerank(retrieved, query=question, analysis=analysis)
 
     print("\n=== DEBUG RERANKED ===")
     for i, (doc, score) in enumerate(reranked[:10], 1):
         print(f"{i}. {doc.metadata.get('source')} | score={score:.2f}")
 
     # 4. STRICT REGULATION LOCK
+    # A page deduplicated at ingest still belongs to every regulation it
+    # was folded from
     locked_docs = [
         (doc, score)
         for doc, score in reranked
-        if expected_filename in doc.metadata.get("source", "").upper()
+        if any(expected_filename in source.upper() for source in doc_sources(doc))
     ]
 
     if not locked_docs:
-        return {
+        return {"result": {
             "answer": f" Dokumen {reg_type} {reg_num} Tahun {reg_year} tidak tersedia di sistem.",
             "sources": [],
             "confidence": {"overall": 0.0},
@@ -174,25 +498,20 @@ def ask(question: str):
                 "valid": False,
                 "error": "Regulation not found"
             }
-        }
+        }}
 
     print("\n=== DEBUG LOCKED DOCS ===")
     for i, (doc, score) in enumerate(locked_docs[:5], 1):
         print(f"{i}. {doc.metadata.get('source')} | page={doc.metadata.get('page')} | score={score:.1f}")
 
     # 5. AUTO SPLIT(Definition)
-    q = question.lower()
-    is_definition = any(k in q for k in [
-        "apa yang dimaksud",
-        "apa itu",
-        "pengertian"
-    ])
+    is_definition = analysis.is_definition
 
     if is_definition:
         selected_docs = [
             (doc, score)
             for doc, score in locked_docs
-            if doc.metadata.get("page") in [0, 1]
+            if attributed_ref(doc, expected_filename)[1] in [0, 1]
         ][:2]
     else:
         selected_docs = locked_docs[:5]
@@ -203,69 +522,196 @@ def ask(question: str):
         print(f"{i}. {doc.metadata.get('source')} | page={doc.metadata.get('page')}")
 
     # 6. CONTEXT BUILDER (STRICT)
-    context = "## DOKUMEN YANG TERSEDIA DI SISTEM (STRICT REGULATION MODE)\n\n"
-    context += " HANYA dokumen berikut yang BOLEH digunakan.\n\n"
-
-    sources = []
-
-    for i, (doc, score) in enumerate(selected_docs, 1):
-        context += f"### DOKUMEN #{i}: {doc.metadata.get('source')}\n"
-        context += f" Halaman: {doc.metadata.get('page')}\n"
-        context += f" Relevance Score: {score:.1f}\n\n"
-        context += f"{doc.page_content}\n\n"
-        context += "=" * 80 + "\n\n"
-
-        sources.append({
-            "document": doc.metadata.get("source"),
-            "page": doc.metadata.get("page"),
-            "score": score
-        })
+    with stage("context"):
+        context = "## DOKUMEN YANG TERSEDIA DI SISTEM (STRICT REGULATION MODE)\n\n"
+        context += " HANYA dokumen berikut yang BOLEH digunakan.\n\n"
+
+        sources = []
+
+        for i, (doc, score) in enumerate(selected_docs, 1):
+            # Pages folded at ingest are cited as the requested regulation's page
+            cited_source, cited_page = attributed_ref(doc, expected_filename)
+            context += f"### DOKUMEN #{i}: {cited_source}\n"
+            context += f" Halaman: {cited_page}\n"
+            refs = other_refs(doc, (cited_source, cited_page))
+            if refs:
+                context += " Teks yang sama juga terdapat di: " + ", ".join(
+                    f"{source} hal. {page}" for source, page in refs
+                ) + "\n"
+            context += f" Relevance Score: {score:.1f}\n\n"
+            context += f"{doc.page_content}\n\n"
+            context += "=" * 80 + "\n\n"
+
+            snippet, spans = extract_snippet(doc, question, analysis, state.highlights)
+            sources.append({
+                "document": cited_source,
+                "page": cited_page,
+                "score": score,
+                "snippet": snippet,
+                "highlights": spans
+            })
 
     print("\n=== DEBUG FULL CONTEXT SENT TO LLM ===")
     print(context[:3000])
 
-    # 7. PROMPT & LLM
-    prompt = ADVANCED_PROMPT_TEMPLATE.format(
+    # 7. PROMPT
+    # The static rules are the system prefix added by generation
+    prompt = QUESTION_PROMPT_TEMPLATE.format(
         context=context,
         question=question
     )
 
-    answer = llm.invoke(prompt)
-    answer_text = str(answer)
+    with stage("confidence"):
+        confidence = calculate_confidence(selected_docs, question, analysis)
+
+    return {
+        "question": question,
+        "context": context,
+        "analysis": analysis,
+        "selected_docs": selected_docs,
+        "sources": sources,
+        "confidence": confidence,
+        "prompt": prompt
+    }
+
+
+def generate_answer(prepared):
+    """Stream the LLM answer, validating citations as tokens arrive.
+
+    Yields {"type": "token"} events, {"type": "restart"} when generation was
+    cancelled on an unavailable citation and is retried with a stricter
+    prompt, and finally {"type": "generation"} with the full text.
+    """
+    prompt = prepared["prompt"]
+    attempts = 2 if CITATION_STREAM_RETRY else 1
+
+    for attempt in range(1, attempts + 1):
+        guard = StreamingCitationValidator(prepared["selected_docs"]) if ENABLE_CITATION_VALIDATION else None
+        parts = []
+        stopped = []
+
+        stream = stream_answer(llm, prompt)
+        try:
+            for token in stream:
+                parts.append(token)
+                yield {"type": "token", "text": token}
+
+                if guard:
+                    stopped = guard.feed(token)
+                    if stopped:
+                        break
+        finally:
+            # Closing the stream drops the connection, which stops Ollama
+            stream.close()
+
+        if guard and not stopped:
+            stopped = guard.finish()
+
+        if not stopped or attempt == attempts:
+            break
+
+        print(f"\n=== DEBUG CITATION GUARD: cancelled on {', '.join(stopped)}, retrying ===")
+        yield {"type": "restart", "reason": f"Dokumen tidak tersedia: {', '.join(stopped)}"}
+
+        # The cited names, which differ from the stored copy for folded pages
+        allowed = ", ".join(sorted(set(source["document"] for source in prepared["sources"])))
+        prompt = QUESTION_PROMPT_TEMPLATE.format(
+            context=prepared["context"],
+            question=prepared["question"] + STRICT_CITATION_RETRY_NOTE.format(
+                forbidden=", ".join(guard.hallucinations), allowed=allowed
+            )
+        )
+
+    yield {
+        "type": "generation",
+        "text": "".join(parts),
+        "stopped_early": bool(stopped),
+        "attempts": attempt
+    }
+
+
+def finalize_answer(prepared, answer_text: str, generation=None):
+    answer_text = strip_reasoning(answer_text)
 
     # 8. POST VALIDATION
-    validation = validate_citations(answer_text, selected_docs)
+    with stage("validation"):
+        validation = validate_citations(answer_text, prepared["selected_docs"])
+    if generation:
+        validation["stopped_early"] = generation["stopped_early"]
+        validation["attempts"] = generation["attempts"]
 
     if not validation["valid"]:
         answer_text = f" PERINGATAN SISTEM: {validation['error']}\n\n" + answer_text
 
-    confidence_info = calculate_confidence(selected_docs, question)
-
     return {
         "answer": answer_text,
-        "sources": sources,
-        "confidence": confidence_info,
-        "num_sources": len(selected_docs),
+        "sources": prepared["sources"],
+        "confidence": prepared["confidence"],
+        "num_sources": len(prepared["selected_docs"]),
         "validation_status": validation
     }
 
 
+def ask(question: str):
+    prepared = prepare_answer(question)
+    if "result" in prepared:
+        return prepared["result"]
+
+    with stage("generation"):
+        for event in generate_answer(prepared):
+            if event["type"] == "generation":
+                break
+
+    return finalize_answer(prepared, event["text"], event)
+
+
+def ask_stream(question: str):
+    """Streaming variant of ask().
+
+    Yields {"type": "retrieval"} with sources and confidence as soon as
+    retrieval is done, then the token/restart events of generate_answer(),
+    and finally {"type": "result"} with the same payload ask()
+    returns.
+    """
+    prepared = prepare_answer(question)
+    if "result" in prepared:
+        yield {"type": "result", **prepared["result"]}
+        return
+
+    yield {
+        "type": "retrieval",
+        "sources": prepared["sources"],
+        "confidence": prepared["confidence"],
+        "num_sources": len(prepared["selected_docs"])
+    }
+
+    for event in generate_answer(prepared):
+        if event["type"] == "generation":
+            yield {"type": "result", **finalize_answer(prepared, event["text"], event)}
+        else:
+            yield event
+
+
 def get_stats():
     return reranker.get_report()
 
+
+def get_embedding_stats():
+    return query_embeddings.stats()
+
+
+def get_memory_stats():
+    return memory.memory_report()
+
 def validate_citations(answer, source_docs):
-    available_docs = [doc.metadata.get('source', '').upper() for doc, _ in source_docs]
-    
-    pattern = r'(UU|POJK|SEOJK)[\s_]*(?:No\.|Nomor)?\s*(\d+)[\s_/]*(?:Tahun\s*)?(\d{4})'
+    available_docs = available_sources(source_docs)
 
-    mentioned = re.findall(pattern, answer, re.IGNORECASE)
+    mentioned = CITATION_PATTERN.findall(answer)
     
     hallucinations = []
     
     for reg_type, num, year in mentioned:
-        expected_file = f"{reg_type.upper()}_{num}_{year}.PDF"
-        
-        found = any(expected_file in doc for doc in available_docs)
+        found = is_available(reg_type, num, year, available_docs)
         
         if not found:
             hallucinations.append(f"{reg_type} {num}/{year}")
@@ -1,5 +1,11 @@
 import re
 
+from app.query_analysis import analyze_query
+from app.dedup import doc_sources
+
+SOURCE_YEAR_PATTERN = re.compile(r'(\d{4})')
+SOURCE_SUFFIX_PATTERN = re.compile(r'_\d{4}\.pdf')
+
 class AdvancedReranker:
     def __init__(self):
         self.base_priority = {
@@ -14,37 +20,28 @@ class AdvancedReranker:
             "SEOJK": {"count": 0, "selected": 0}
         }
 
-    def _adapt_priority_to_query(self, query):
-        query_lower = query.lower()
-        adapted_priority = self.base_priority.copy()
-
-        if any(w in query_lower for w in ["undang-undang", "uu ", "uu:"]):
-            adapted_priority["UU"] = 80
-        elif any(w in query_lower for w in ["pojk", "peraturan ojk"]):
-            adapted_priority["POJK"] = 80
-        elif any(w in query_lower for w in ["seojk", "surat edaran"]):
-            adapted_priority["SEOJK"] = 80
-        else:
-            adapted_priority = {"UU": 50, "POJK": 50, "SEOJK": 50}
+    def _adapt_priority_to_query(self, analysis):
+        if analysis.type_hint is None:
+            return {"UU": 50, "POJK": 50, "SEOJK": 50}
 
+        adapted_priority = self.base_priority.copy()
+        adapted_priority[analysis.type_hint] = 80
         return adapted_priority
 
-    def _extract_year_from_query(self, query):
-        m = re.search(r'(tahun\s+)?(20\d{2})', query.lower())
-        return int(m.group(2)) if m else None
-
-    def _extract_regulation_from_query(self, query):
-        m = re.search(r'(pojk|seojk|uu)\s*(nomor\s*)?\d+', query.lower())
-        return m.group(0).upper().replace('NOMOR', '').strip() if m else None
-
-    def score_document(self, doc, query, base_rank):
+    def score_document(self, doc, query, base_rank, analysis=None, adapted_priority=None):
         explanations = []
         score = 0
 
+        if analysis is None:
+            analysis = analyze_query(query)
+        if adapted_priority is None:
+            adapted_priority = self._adapt_priority_to_query(analysis)
+
         content_lower = doc.page_content.lower()
-        query_lower = query.lower()
         metadata = doc.metadata
         source = metadata.get("source", "unknown")
+        # Pages deduplicated at ingest also stand for the regulations folded into them
+        sources = [s for s in doc_sources(doc) if s] or ["unknown"]
 
         reg_type = source.split('_')[0] if source != "unknown" and "_" in source else "UNKNOWN"
 
@@ -55,24 +52,25 @@ class AdvancedReranker:
         score += rank_score
         explanations.append(f"Peringkat retrieval #{base_rank+1}: +{rank_score:.1f}")
 
-        qt = set(query_lower.split())
+        qt = analysis.token_set
         ct = set(content_lower.split())
         overlap = qt & ct
         overlap_score = len(overlap) * 5
         score += overlap_score
         explanations.append(f"Kata kunci cocok ({len(overlap)}/{len(qt)}): +{overlap_score:.1f}")
 
-        adapted_priority = self._adapt_priority_to_query(query)
         if reg_type in adapted_priority:
             p = adapted_priority[reg_type] 
             score += p
             explanations.append(f"Prioritas tipe {reg_type}: +{p:.1f}")
 
-        query_year = self._extract_year_from_query(query)
+        query_year = analysis.year
+        source_years = [
+            int(sm.group(1)) for sm in map(SOURCE_YEAR_PATTERN.search, sources) if sm
+        ]
         if query_year and source != "unknown":
-            sm = re.search(r'(\d{4})', source)
-            if sm:
-                source_year = int(sm.group(1))
+            if source_years:
+                source_year = min(source_years, key=lambda y: abs(y - query_year))
                 diff = abs(source_year - query_year)
 
                 if source_year == query_year:
@@ -90,35 +88,24 @@ class AdvancedReranker:
                     explanations.append(f"Perbedaan tahun ({source_year} vs {query_year}): -{penalty:.1f}")
 
 
-        if any(term in query_lower for term in ['ojk', 'otoritas jasa keuangan', 'tugas ojk', 'wewenang ojk']):
-            if 'UU_21_2011' in source:
-                score += 250 
-                explanations.append("Query tentang OJK + UU OJK: +250")
-        
-        if any(term in query_lower for term in ['manajemen risiko teknologi', 'manajemen risiko ti', 'teknologi informasi']):
-            if 'POJK_11_2022' in source:
-                score += 250
-                explanations.append("Query tentang Risiko TI + POJK 11/2022: +250")
+        for pattern, boost, label in analysis.topic_boosts:
+            if any(pattern in s for s in sources):
+                score += boost
+                explanations.append(label)
 
-        query_reg = self._extract_regulation_from_query(query)
+        query_reg = analysis.regulation_mention
         if query_reg and source != "unknown":
-            source_reg = re.sub(r'_\d{4}\.pdf', '', source).replace('_', ' ')
-            if query_reg.lower() in source_reg.lower():
+            source_regs = [SOURCE_SUFFIX_PATTERN.sub('', s).replace('_', ' ').lower() for s in sources]
+            if any(query_reg.lower() in r for r in source_regs):
                 score += 500
                 explanations.append(f"Nama regulasi match ({query_reg}): +200")
             else:
                 score -= 50 
                 explanations.append(f"Document mismatch: -50")
 
-        important_terms = [
-            "pasal", "ayat", "huruf", "angka",
-            "ketentuan", "peraturan", "undang-undang",
-            "bank", "risiko", "modal", "likuiditas"
-        ]
-
         term_count = sum(
-            1 for t in important_terms
-            if t in query_lower and t in content_lower
+            1 for t in analysis.important_terms
+            if t in content_lower
         )
 
         if term_count:
@@ -128,12 +115,18 @@ class AdvancedReranker:
 
         return score, explanations
 
-    def rerank(self, docs, query=None):
+    def rerank(self, docs, query=None, analysis=None):
         scored = []
 
+        if query and analysis is None:
+            analysis = analyze_query(query)
+        adapted_priority = self._adapt_priority_to_query(analysis) if query else None
+
         for rank, doc in enumerate(docs):
             if query:
-                score, explanations = self.score_document(doc, query, rank)
+                score, explanations = self.score_document(
+                    doc, query, rank, analysis=analysis, adapted_priority=adapted_priority
+                )
             else:
                 score = self._simple_score(doc)
                 explanations = ["Simple scoring (no query)"]
@@ -1,35 +1,49 @@
 import numpy as np
 from rank_bm25 import BM25Okapi
-import re
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from app.query_analysis import analyze_query
+from app.profiling import propagate
+from app.config import RETRIEVAL_POOL_SIZE, EMBEDDING_MAX_BATCH
+
+FUSION_METHODS = ("rrf", "score")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Shared pool for the dense branch, reused across index versions"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Each dense search embeds its query here, so the pool has to
+            # hold a full embedding batch or the batcher can never fill one
+            workers = max(RETRIEVAL_POOL_SIZE, EMBEDDING_MAX_BATCH)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dense-retrieval")
+        return _executor
+
 
 class HybridRetriever:
-    def __init__(self, vectorstore, chunks, k=10):
+    def __init__(self, vectorstore, chunks, k=10, concurrent=False, fusion="rrf"):
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method: {fusion}")
+
         self.vectorstore = vectorstore
         self.k = k
         self.chunks = chunks
+        self.concurrent = concurrent
+        self.fusion = fusion
 
-        self.topic_priority = {
-            'ojk': ['UU_21_2011'],
-            'otoritas jasa keuangan': ['UU_21_2011'],
-            'tugas ojk': ['UU_21_2011'],
-            'wewenang ojk': ['UU_21_2011'],
-            'manajemen risiko teknologi': ['POJK_11_2022'],
-            'manajemen risiko ti': ['POJK_11_2022'],
-            'teknologi informasi bank': ['POJK_11_2022'],
-            'modal minimum': ['POJK_27_2022'],
-            'permodalan bank': ['POJK_27_2022']
-        }
-        
         tokenized = [c.page_content.lower().split() for c in chunks]
         self.bm25 = BM25Okapi(tokenized)
     
-    def _determine_alpha(self, query):
-        query_lower = query.lower()
-        has_specific = bool(re.search(r'(pojk|seojk|uu)\s*\d+', query_lower))
-        has_pasal = 'pasal' in query_lower
-        return 0.3 if (has_specific or has_pasal) else 0.6
+    def _determine_alpha(self, analysis):
+        return 0.3 if (analysis.has_specific_regulation or analysis.has_pasal) else 0.6
     
-    def reciprocal_rank_fusion(self, dense, sparse_idx, alpha=0.5, k=60):
+    def reciprocal_rank_fusion(self, dense, sparse, alpha=0.5, k=60, with_scores=False):
+        """dense and sparse are documents in rank order"""
         scores = {}
         doc_map = {}
         
@@ -41,24 +55,62 @@ class HybridRetriever:
             scores[did] = scores.get(did, 0) + alpha * (1 / (k + rank + 1))
             doc_map[did] = doc
         
-        for rank, idx in enumerate(sparse_idx):
-            doc = self.chunks[idx]
+        for rank, doc in enumerate(sparse):
             did = doc_id(doc)
             scores[did] = scores.get(did, 0) + (1 - alpha) * (1 / (k + rank + 1))
             doc_map[did] = doc
         
         ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        if with_scores:
+            return [(doc_map[did], score) for did, score in ranked]
         return [doc_map[did] for did, _ in ranked]
     
-    def _boost_by_topic(self, query, documents):
+    @staticmethod
+    def _normalize(scores):
+        scores = np.asarray(scores, dtype=float)
+        if scores.size == 0:
+            return scores
+        lo, hi = scores.min(), scores.max()
+        if hi - lo < 1e-12:
+            return np.ones_like(scores)
+        return (scores - lo) / (hi - lo)
+
+    def score_fusion(self, dense, dense_scores, sparse, sparse_scores, alpha=0.5, with_scores=False):
+        """Weighted sum of min-max normalized dense similarity and BM25 scores"""
+        scores = {}
+        doc_map = {}
+
+        def doc_id(doc):
+            return f"{doc.metadata.get('source')}::{doc.metadata.get('page')}"
+
+        for doc, s in zip(dense, self._normalize(dense_scores)):
+            did = doc_id(doc)
+            scores[did] = scores.get(did, 0) + alpha * s
+            doc_map[did] = doc
+
+        for doc, s in zip(sparse, self._normalize(sparse_scores)):
+            did = doc_id(doc)
+            scores[did] = scores.get(did, 0) + (1 - alpha) * s
+            doc_map[did] = doc
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        if with_scores:
+            return [(doc_map[did], score) for did, score in ranked]
+        return [doc_map[did] for did, _ in ranked]
+
+    def _dense_search(self, query):
+        results = self.vectorstore.similarity_search_with_score(query, k=self.k)
+        # Chroma returns distances (lower is closer); negate into similarities
+        return [doc for doc, _ in results], [-dist for _, dist in results]
+
+    def _sparse_search(self, tokens):
+        sparse_scores = self.bm25.get_scores(tokens)
+        sparse_idx = np.argsort(sparse_scores)[::-1][:self.k]
+        return [self.chunks[i] for i in sparse_idx], sparse_scores[sparse_idx]
+
+    def _boost_by_topic(self, analysis, documents):
         """Boost documents based on query topic"""
-        query_lower = query.lower()
-        
-        # Find matching topics
-        priority_docs = []
-        for topic, doc_patterns in self.topic_priority.items():
-            if topic in query_lower:
-                priority_docs.extend(doc_patterns)
+        priority_docs = analysis.priority_docs
         
         if not priority_docs:
             return documents  
@@ -78,12 +130,45 @@ class HybridRetriever:
         
         return boosted + normal
     
-    def retrieve(self, query):
-        alpha = self._determine_alpha(query)
-        dense = self.vectorstore.similarity_search(query, k=self.k)
-        sparse_scores = self.bm25.get_scores(query.lower().split())
-        sparse_idx = np.argsort(sparse_scores)[::-1][:self.k]
-        fused = self.reciprocal_rank_fusion(dense, sparse_idx, alpha=alpha)[:self.k]
-        fused = self._boost_by_topic(query, fused)
+    def search(self, query, analysis):
+        """Raw candidates before fusion: (dense, dense_scores, sparse, sparse_scores).
+
+        Dense scores are negated Chroma distances and sparse scores raw BM25,
+        each list best first.
+        """
+        if self.concurrent:
+            # Dense branch on the pool, BM25 on this thread
+            dense_future = _get_executor().submit(propagate(self._dense_search), query)
+            sparse, sparse_scores = self._sparse_search(analysis.tokens)
+            dense, dense_scores = dense_future.result()
+        else:
+            dense, dense_scores = self._dense_search(query)
+            sparse, sparse_scores = self._sparse_search(analysis.tokens)
+        return dense, dense_scores, sparse, sparse_scores
+
+    def fuse(self, dense, dense_scores, sparse, sparse_scores, analysis, k=None):
+        """Fused (doc, score) pairs, best first, cut to k"""
+        alpha = self._determine_alpha(analysis)
+
+        if self.fusion == "score":
+            fused = self.score_fusion(
+                dense, dense_scores, sparse, sparse_scores, alpha=alpha, with_scores=True
+            )
+        else:
+            fused = self.reciprocal_rank_fusion(dense, sparse, alpha=alpha, with_scores=True)
+        return fused[:k or self.k]
+
+    def retrieve_scored(self, query, analysis=None):
+        """Fused (doc, score) pairs before topic boosting"""
+        if analysis is None:
+            analysis = analyze_query(query)
+        return self.fuse(*self.search(query, analysis), analysis)
+
+    def retrieve(self, query, analysis=None):
+        if analysis is None:
+            analysis = analyze_query(query)
+
+        fused = [doc for doc, _ in self.retrieve_scored(query, analysis)]
+        fused = self._boost_by_topic(analysis, fused)
         
-        return fused
\ No newline at end of file
+        return fused
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from app.config import RULES_PATH, RULES_RELOAD_INTERVAL
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: every pattern found in one pass.
+
+    Matching cost depends on the length of the text and the number of hits,
+    not on how many patterns are loaded.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+    def add(self, pattern, value):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+                self.goto[node][ch] = nxt
+            node = nxt
+        self.out[node].append(value)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+        return self
+
+    def search(self, text):
+        node = 0
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            if self.out[node]:
+                yield from self.out[node]
+
+
+def _is_str_list(value, allow_empty=True):
+    return (
+        isinstance(value, list)
+        and (allow_empty or bool(value))
+        and all(isinstance(v, str) and v for v in value)
+    )
+
+
+def _validate(topics, boosts):
+    """Raise ValueError on a malformed rules file, before it replaces the live rules"""
+    if not isinstance(topics, list) or not isinstance(boosts, list):
+        raise ValueError("'topics' and 'boosts' must be lists")
+
+    for i, rule in enumerate(topics):
+        if not isinstance(rule, dict):
+            raise ValueError(f"topics[{i}]: must be an object")
+        if not _is_str_list(rule.get("terms"), allow_empty=False):
+            raise ValueError(f"topics[{i}]: 'terms' must be a non-empty list of non-empty strings")
+        if not _is_str_list(rule.get("priority_docs")):
+            raise ValueError(f"topics[{i}]: 'priority_docs' must be a list of strings")
+
+    for i, rule in enumerate(boosts):
+        if not isinstance(rule, dict):
+            raise ValueError(f"boosts[{i}]: must be an object")
+        if not _is_str_list(rule.get("terms"), allow_empty=False):
+            raise ValueError(f"boosts[{i}]: 'terms' must be a non-empty list of non-empty strings")
+        score = rule.get("score")
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            raise ValueError(f"boosts[{i}]: 'score' must be a number")
+        for field in ("source", "label"):
+            if not isinstance(rule.get(field), str):
+                raise ValueError(f"boosts[{i}]: '{field}' must be a string")
+
+
+class RuleSet:
+    """Topic-priority and boost rules compiled into one automaton.
+
+    Rules file format (JSON):
+        {"topics": [{"terms": [...], "priority_docs": [...]}],
+         "boosts": [{"terms": [...], "source": "...", "score": 250, "label": "..."}]}
+    Terms match as lowercase substrings of the query, like the `in` checks
+    they replace.
+    """
+
+    def __init__(self, topics, boosts):
+        _validate(topics, boosts)
+        self.topics = topics
+        self.boosts = boosts
+        self.matcher = AhoCorasick()
+
+        for i, rule in enumerate(topics):
+            for term in rule["terms"]:
+                self.matcher.add(term.lower(), ("topic", i, term.lower()))
+        for i, rule in enumerate(boosts):
+            for term in rule["terms"]:
+                self.matcher.add(term.lower(), ("boost", i, term.lower()))
+
+        self.matcher.build()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError("rules file must contain a JSON object")
+        return cls(data.get("topics", []), data.get("boosts", []))
+
+    def match(self, query_lower):
+        """(matched topic terms, priority doc patterns, boosts) for a query"""
+        topic_ids = set()
+        boost_ids = set()
+        terms = set()
+
+        for kind, i, term in self.matcher.search(query_lower):
+            if kind == "topic":
+                topic_ids.add(i)
+                terms.add(term)
+            else:
+                boost_ids.add(i)
+
+        priority_docs = [p for i in sorted(topic_ids) for p in self.topics[i]["priority_docs"]]
+        boosts = [
+            (self.boosts[i]["source"], self.boosts[i]["score"], self.boosts[i]["label"])
+            for i in sorted(boost_ids)
+        ]
+        return sorted(terms), priority_docs, boosts
+
+    def size(self):
+        return {
+            "topics": len(self.topics),
+            "boosts": len(self.boosts),
+            "automaton_states": len(self.matcher.goto)
+        }
+
+
+_lock = threading.Lock()
+_state = {"rules": None, "mtime": None, "checked": 0.0}
+
+
+def reload_rules(path=RULES_PATH):
+    """Load the rules file now; a broken file keeps the previous rules"""
+    rules = RuleSet.load(path)
+    with _lock:
+        _state.update(rules=rules, mtime=os.path.getmtime(path), checked=time.time())
+    print(f" Rules loaded: {rules.size()}")
+    return rules
+
+
+def get_rules(path=RULES_PATH):
+    rules = _state["rules"]
+    if rules is None:
+        return reload_rules(path)
+
+    now = time.time()
+    if RULES_RELOAD_INTERVAL and now - _state["checked"] >= RULES_RELOAD_INTERVAL:
+        _state["checked"] = now
+        try:
+            if os.path.getmtime(path) != _state["mtime"]:
+                return reload_rules(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f" Rules reload failed, keeping previous rules: {e}")
+
+    return rules
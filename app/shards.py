@@ -0,0 +1,138 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.query_analysis import analyze_query
+from app.profiling import propagate
+
+REG_TYPES = ("UU", "POJK", "SEOJK")
+SHARDING_MODES = (None, "type", "type_year")
+UNSHARDED_KEY = "ALL"
+
+SOURCE_YEAR_PATTERN = re.compile(r'_(\d{4})\.pdf$', re.IGNORECASE)
+
+_fanout_executor = None
+_fanout_lock = threading.Lock()
+
+
+def _get_fanout_executor():
+    # Separate from the dense-retrieval pool: fan-out tasks wait on it
+    global _fanout_executor
+    with _fanout_lock:
+        if _fanout_executor is None:
+            _fanout_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="shard-fanout")
+        return _fanout_executor
+
+
+def shard_key(source, sharding):
+    """UU_21_2011.pdf -> "UU" (type) or "UU_2011" (type_year)"""
+    if not sharding:
+        return UNSHARDED_KEY
+
+    reg_type = source.split('_')[0].upper()
+    if reg_type not in REG_TYPES:
+        reg_type = "OTHER"
+
+    if sharding == "type_year":
+        m = SOURCE_YEAR_PATTERN.search(source)
+        return f"{reg_type}_{m.group(1) if m else 'NA'}"
+    return reg_type
+
+
+def collection_name(key):
+    return f"regulasi_{key.lower()}"
+
+
+def group_by_shard(documents, sharding):
+    groups = {}
+    for doc in documents:
+        key = shard_key(doc.metadata.get("source", ""), sharding)
+        groups.setdefault(key, []).append(doc)
+    return groups
+
+
+class ShardRouter:
+    """Picks the shards a query has to search, from its QueryAnalysis"""
+
+    def __init__(self, shard_keys, sharding):
+        self.shard_keys = sorted(shard_keys)
+        self.sharding = sharding
+
+    def _matching(self, reg_type, year=None):
+        keys = [k for k in self.shard_keys if k.split('_')[0] == reg_type]
+        if year and self.sharding == "type_year":
+            keys = [k for k in keys if k == f"{reg_type}_{year}"]
+        return keys
+
+    def route(self, analysis):
+        if analysis.regulation:
+            # ask() locks onto this regulation anyway, other shards are wasted work
+            target = analysis.regulation
+            keys = self._matching(target["type"], target["year"])
+            return keys or list(self.shard_keys)
+
+        keys = self._matching(analysis.type_hint, analysis.year) if analysis.type_hint else []
+        if not keys:
+            # Ambiguous query: topic rules only reorder results, so search everything
+            return list(self.shard_keys)
+
+        # Topic rules may point at documents outside the mentioned type
+        for pattern in analysis.priority_docs:
+            reg_type = pattern.split('_')[0]
+            keys += [k for k in self._matching(reg_type) if k not in keys]
+
+        return keys
+
+
+class ShardedRetriever:
+    """One HybridRetriever per shard behind a router.
+
+    Queries that route to one shard go straight to it; ambiguous queries
+    fan out in parallel. Fused scores (RRF ranks, min-max scores) are
+    relative to one shard, so the fan-out gathers each shard's raw dense
+    distances and BM25 candidates and fuses them once over the union.
+    """
+
+    def __init__(self, retrievers, sharding, k=10):
+        self.retrievers = retrievers
+        self.router = ShardRouter(retrievers.keys(), sharding)
+        self.k = k
+        self.route_stats = {key: 0 for key in retrievers}
+        self._stats_lock = threading.Lock()
+
+    def retrieve(self, query, analysis=None):
+        if analysis is None:
+            analysis = analyze_query(query)
+
+        keys = self.router.route(analysis)
+        with self._stats_lock:
+            for key in keys:
+                self.route_stats[key] += 1
+
+        print(f"\n=== DEBUG SHARD ROUTE: {', '.join(keys)} ===")
+
+        if len(keys) == 1:
+            return self.retrievers[keys[0]].retrieve(query, analysis=analysis)
+
+        futures = [
+            _get_fanout_executor().submit(propagate(self.retrievers[key].search), query, analysis)
+            for key in keys
+        ]
+        dense, sparse = [], []
+        for f in futures:
+            shard_dense, dense_scores, shard_sparse, sparse_scores = f.result()
+            dense += zip(shard_dense, dense_scores)
+            sparse += zip(shard_sparse, sparse_scores)
+
+        # Dense scores share one embedding space; BM25 scores are per-shard
+        # but on the same scale, unlike fused ranks
+        dense.sort(key=lambda x: x[1], reverse=True)
+        sparse.sort(key=lambda x: x[1], reverse=True)
+
+        lead = self.retrievers[keys[0]]
+        fused = lead.fuse(
+            [d for d, _ in dense], [s for _, s in dense],
+            [d for d, _ in sparse], [s for _, s in sparse],
+            analysis, k=self.k
+        )
+        return lead._boost_by_topic(analysis, [doc for doc, _ in fused])
@@ -1,25 +1,15 @@
-import re
+from app.query_analysis import analyze_query, REGULATION_PATTERN
 
 class StrictRegulationContextBuilder:
-    REG_PATTERN = r'(POJK|SEOJK|UU)\s*(?:No\.|Nomor)?\s*(\d+)\s*(?:/|Tahun)?\s*(\d{4})'
-
-    def parse_target_regulation(self, question: str):
-        m = re.search(self.REG_PATTERN, question.upper())
-        if not m:
-            return None
-
-        reg_type, num, year = m.groups()
-        num = str(int(num))
-        expected_filename = f"{reg_type}_{num}_{year}"
-        return {
-            "type": reg_type,
-            "number": num,
-            "year": year,
-            "expected_filename": expected_filename
-        }
+    REG_PATTERN = REGULATION_PATTERN
+
+    def parse_target_regulation(self, question: str, analysis=None):
+        if analysis is None:
+            analysis = analyze_query(question)
+        return analysis.regulation
 
-    def filter_documents(self, selected_docs, question: str):
-        target = self.parse_target_regulation(question)
+    def filter_documents(self, selected_docs, question: str, analysis=None):
+        target = self.parse_target_regulation(question, analysis)
         if not target:
             return selected_docs, None
 
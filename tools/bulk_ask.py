@@ -0,0 +1,226 @@
+"""Resumable offline bulk question answering.
+
+Reads questions from JSONL ({"id": ..., "question": ...}) or CSV (columns
+id, question), runs parsing/retrieval/reranking on a pool of workers that
+stays ahead of the LLM, and runs LLM calls at bounded concurrency.
+Every finished answer is appended to the output JSONL immediately; a
+rerun with the same output skips questions already answered.
+
+    python -m tools.bulk_ask questions.csv answers.jsonl --llm-concurrency 2
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+from app.config import LLM_CONCURRENCY
+
+QUESTION_FIELDS = ("question", "pertanyaan", "q")
+
+_DONE = object()
+
+
+def read_questions(path):
+    path = Path(path)
+    rows = []
+
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    questions = []
+    for i, row in enumerate(rows, 1):
+        text = next((row[k] for k in QUESTION_FIELDS if row.get(k)), None)
+        if not text:
+            continue
+        questions.append((str(row.get("id") or i), text.strip()))
+    return questions
+
+
+def completed_ids(output_path):
+    """Ids already in the output. A torn last line (crash mid-write) is cut off."""
+    path = Path(output_path)
+    if not path.exists():
+        return set()
+
+    done = set()
+    good_bytes = 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                break
+            good_bytes += len(line)
+
+    if good_bytes < path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(good_bytes)
+    return done
+
+
+class ResultWriter:
+    """Appends JSONL records and keeps a small checkpoint file next to them"""
+
+    def __init__(self, output_path, total, sync_every=10):
+        self.path = Path(output_path)
+        self.checkpoint_path = self.path.with_name(self.path.name + ".ckpt.json")
+        self.errors_path = self.path.with_name(self.path.name + ".errors.jsonl")
+        self.total = total
+        self.sync_every = sync_every
+        self.written = 0
+        self.failed = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._out = open(self.path, "a", encoding="utf-8")
+
+    def _checkpoint(self):
+        elapsed = time.time() - self.started
+        self.checkpoint_path.write_text(json.dumps({
+            "output": str(self.path),
+            "written": self.written,
+            "failed": self.failed,
+            "remaining": self.total - self.written - self.failed,
+            "elapsed_seconds": elapsed,
+            "answers_per_minute": 60 * self.written / elapsed if elapsed else None,
+            "updated": time.time()
+        }, indent=2), encoding="utf-8")
+
+    def write(self, record):
+        with self._lock:
+            self._out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._out.flush()
+            self.written += 1
+            if self.written % self.sync_every == 0:
+                os.fsync(self._out.fileno())
+                self._checkpoint()
+                print(f" {self.written}/{self.total} answered")
+
+    def error(self, qid, question, exc):
+        with self._lock:
+            with open(self.errors_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"id": qid, "question": question, "error": repr(exc)}) + "\n")
+            self.failed += 1
+
+    def close(self):
+        with self._lock:
+            self._out.flush()
+            os.fsync(self._out.fileno())
+            self._out.close()
+            self._checkpoint()
+
+
+def _record(qid, question, result, timings):
+    return {
+        "id": qid,
+        "question": question,
+        "answer": result["answer"],
+        "sources": result["sources"],
+        "confidence": result["confidence"],
+        "num_sources": result["num_sources"],
+        "validation_status": result["validation_status"],
+        "timings": timings
+    }
+
+
+def run_job(input_path, output_path, llm_concurrency=LLM_CONCURRENCY, prepare_workers=2, lookahead=None):
+    from app import rag
+
+    done = completed_ids(output_path)
+    pending = [(qid, q) for qid, q in read_questions(input_path) if qid not in done]
+    print(f" {len(done)} already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    writer = ResultWriter(output_path, len(pending))
+    # Prepared prompts waiting for the LLM; keeps it busy without
+    # retrieving the whole job up front
+    ready = queue.Queue(maxsize=lookahead or llm_concurrency * 2)
+    source = iter(pending)
+    source_lock = threading.Lock()
+
+    def prepare_worker():
+        while True:
+            with source_lock:
+                item = next(source, None)
+            if item is None:
+                return
+
+            qid, question = item
+            start = time.perf_counter()
+            try:
+                prepared = rag.prepare_answer(question)
+            except Exception as e:
+                writer.error(qid, question, e)
+                continue
+            prepare_seconds = time.perf_counter() - start
+
+            if "result" in prepared:
+                # Answered without the LLM (no regulation / not in corpus)
+                writer.write(_record(qid, question, prepared["result"], {"prepare": prepare_seconds}))
+            else:
+                ready.put((qid, question, prepared, prepare_seconds))
+
+    def llm_worker():
+        while True:
+            item = ready.get()
+            if item is _DONE:
+                return
+
+            qid, question, prepared, prepare_seconds = item
+            start = time.perf_counter()
+            try:
+                for event in rag.generate_answer(prepared):
+                    if event["type"] == "generation":
+                        break
+                result = rag.finalize_answer(prepared, event["text"], event)
+            except Exception as e:
+                writer.error(qid, question, e)
+                continue
+
+            writer.write(_record(qid, question, result, {
+                "prepare": prepare_seconds,
+                "generation": time.perf_counter() - start
+            }))
+
+    preparers = [threading.Thread(target=prepare_worker, daemon=True) for _ in range(prepare_workers)]
+    generators = [threading.Thread(target=llm_worker, daemon=True) for _ in range(llm_concurrency)]
+    for t in preparers + generators:
+        t.start()
+
+    try:
+        for t in preparers:
+            t.join()
+        for _ in generators:
+            ready.put(_DONE)
+        for t in generators:
+            t.join()
+    finally:
+        writer.close()
+
+    print(f" Done: {writer.written} answered, {writer.failed} failed "
+          f"(failed questions are retried on the next run)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="questions (.jsonl or .csv)")
+    parser.add_argument("output", help="answers (.jsonl), also the resume checkpoint")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY)
+    parser.add_argument("--prepare-workers", type=int, default=2)
+    parser.add_argument("--lookahead", type=int, default=None,
+                        help="prepared questions queued for the LLM (default 2x llm concurrency)")
+    args = parser.parse_args()
+
+    run_job(args.input, args.output, args.llm_concurrency, args.prepare_workers, args.lookahead)
+
+
+if __name__ == "__main__":
+    main()
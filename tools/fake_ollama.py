@@ -0,0 +1,198 @@
+"""Stand-in for the Ollama HTTP API, for load tests and local checks.
+
+Implements /api/generate (streaming and non-streaming) with a configurable
+per-token latency. The answer cites the first document of the RAG context,
+so citation validation in the app passes. Like Ollama, the model unloads
+after the request's keep_alive (default 5m) and the next request pays
+--load-time again; the prompt prefix shared with the previous request is
+recorded as "cached_prefix".
+
+    python -m tools.fake_ollama --port 11434 --token-latency 0.05 --tokens 120
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DOC_PATTERN = re.compile(r'### DOKUMEN #1: (\S+)')
+DURATION_PATTERN = re.compile(r'^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$')
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, None: 1}
+DEFAULT_KEEP_ALIVE = 300
+
+
+def keep_alive_seconds(value):
+    """Ollama keep_alive (number of seconds or "30m") in seconds; negative = forever"""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    m = DURATION_PATTERN.match(str(value).strip())
+    if not m:
+        return DEFAULT_KEEP_ALIVE
+    return float(m.group(1)) * DURATION_UNITS[m.group(2)]
+
+
+def common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class FakeOllama:
+    def __init__(self, token_latency=0.05, num_tokens=120, load_time=0.0, think_tokens=0):
+        self.token_latency = token_latency
+        self.num_tokens = num_tokens
+        self.load_time = load_time
+        self.think_tokens = think_tokens
+        self.requests = []
+        self.loaded = False
+        self.loads = 0
+        self._unload_at = None
+        self._last_prompt = ""
+        self._lock = threading.Lock()
+
+    def tokens_for(self, prompt, num_predict=None):
+        # The last match: the rules before the context contain an example
+        found = DOC_PATTERN.findall(prompt)
+        source = found[-1] if found else "dokumen"
+        tokens = []
+
+        tail = prompt.rstrip()
+        if self.think_tokens and not tail.endswith("</think>"):
+            # The app may already have opened the reasoning block (raw prompt)
+            tokens += [] if tail.endswith("<think>") else ["<think>"]
+            tokens += ["pikir "] * self.think_tokens + ["</think>\n\n"]
+
+        tokens += [f"Berdasarkan {source}, Halaman 0, "]
+        tokens += ["isi "] * max(self.num_tokens - 1, 0)
+
+        if num_predict and num_predict > 0:
+            tokens = tokens[:num_predict]
+        return tokens
+
+    def record(self, payload):
+        """Returns whether the request found the model unloaded"""
+        now = time.monotonic()
+        prompt = payload.get("prompt") or ""
+        keep_alive = keep_alive_seconds(payload.get("keep_alive"))
+
+        with self._lock:
+            if self.loaded and self._unload_at is not None and now > self._unload_at:
+                self.loaded = False
+            cold = not self.loaded
+            self.loaded = True
+            if cold:
+                self.loads += 1
+                self._last_prompt = ""
+
+            payload["cached_prefix"] = common_prefix_length(self._last_prompt, prompt)
+            payload["cold"] = cold
+            self._last_prompt = prompt
+            self._unload_at = None if keep_alive < 0 else now + keep_alive
+            self.requests.append(payload)
+
+        if cold and self.load_time:
+            time.sleep(self.load_time)
+        return cold
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": "deepseek-r1:latest"}]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path != "/api/generate":
+                self._json(404, {"error": "not found"})
+                return
+
+            fake.record(payload)
+            prompt = payload.get("prompt") or ""
+            options = payload.get("options") or {}
+            tokens = fake.tokens_for(prompt, options.get("num_predict"))
+
+            if payload.get("stream") is False:
+                time.sleep(fake.token_latency * len(tokens))
+                self._json(200, {"model": payload.get("model"), "response": "".join(tokens), "done": True})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            try:
+                for token in tokens:
+                    time.sleep(fake.token_latency)
+                    self._chunk({"model": payload.get("model"), "response": token, "done": False})
+                self._chunk({"model": payload.get("model"), "response": "", "done": True,
+                             "eval_count": len(tokens)})
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client cancelled the generation
+                pass
+
+        def _chunk(self, body):
+            data = json.dumps(body).encode() + b"\n"
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_fake_ollama(port=11434, host="127.0.0.1", **kwargs):
+    """Start the server on a daemon thread; returns (server, fake)"""
+    fake = FakeOllama(**kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server, fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-latency", type=float, default=0.05, help="seconds per token")
+    parser.add_argument("--tokens", type=int, default=120, help="answer length in tokens")
+    parser.add_argument("--think-tokens", type=int, default=0, help="reasoning tokens before the answer")
+    parser.add_argument("--load-time", type=float, default=0.0, help="delay of the first (cold) request")
+    args = parser.parse_args()
+
+    server, _ = start_fake_ollama(
+        port=args.port, host=args.host,
+        token_latency=args.token_latency, num_tokens=args.tokens,
+        load_time=args.load_time, think_tokens=args.think_tokens
+    )
+    print(f" Fake Ollama on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Check LLM warm-up, keep-alive and the shared system prefix against the fake Ollama.
+
+Starts tools.fake_ollama with a simulated model load time, warms the model
+the way the app does at startup, then sends two answers and checks that:
+every request carries keep_alive, the warm-up asks for a single token, the
+first answer does not pay the model load, and each answer starts with the
+same system prefix the warm-up evaluated.
+
+    python -m tools.llm_warmup_check --load-time 1.0
+"""
+import argparse
+import socket
+import sys
+import time
+
+from app.config import LLM_KEEP_ALIVE
+from app.generation import SYSTEM_PROMPT, build_llm, stream_answer, uses_raw_prompt, warm_up
+from app.prompt import QUESTION_PROMPT_TEMPLATE
+from tools.fake_ollama import start_fake_ollama
+
+QUESTIONS = (
+    "Apa yang dimaksud dengan POJK 27 Tahun 2022?",
+    "Berapa modal minimum bank umum menurut POJK 11 Tahun 2016?",
+)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _answer(llm, question):
+    prompt = QUESTION_PROMPT_TEMPLATE.format(
+        context="### DOKUMEN #1: POJK_27_2022.pdf\n Halaman: 0\n\nisi dokumen\n",
+        question=question
+    )
+    start = time.perf_counter()
+    text = "".join(stream_answer(llm, prompt))
+    return text, time.perf_counter() - start
+
+
+def run_check(load_time=1.0, token_latency=0.001):
+    port = _free_port()
+    server, fake = start_fake_ollama(
+        port=port, token_latency=token_latency, num_tokens=20,
+        think_tokens=5, load_time=load_time
+    )
+    failures = []
+
+    def check(ok, message):
+        print(f" {'ok  ' if ok else 'FAIL'} {message}")
+        if not ok:
+            failures.append(message)
+
+    try:
+        llm = build_llm(base_url=f"http://127.0.0.1:{port}")
+
+        warm_seconds = warm_up(llm)
+        print(f" warm-up took {warm_seconds:.2f}s (simulated load {load_time:.2f}s)")
+        answers = [_answer(llm, q) for q in QUESTIONS]
+        for (text, seconds), question in zip(answers, QUESTIONS):
+            print(f" answer in {seconds:.2f}s: {text[:60]!r}")
+
+        warm, *asked = fake.requests
+
+        check(warm["cold"] and warm["options"].get("num_predict") == 1,
+              "warm-up loads the model with a 1-token request")
+        check(all(r.get("keep_alive") == LLM_KEEP_ALIVE for r in fake.requests),
+              f"every request sends keep_alive={LLM_KEEP_ALIVE!r}")
+        check(fake.loads == 1 and not any(r["cold"] for r in asked),
+              "answers find the model already loaded")
+        check(answers[0][1] < load_time,
+              "first answer does not wait for the model load")
+
+        if uses_raw_prompt():
+            check(all(r["prompt"].startswith(SYSTEM_PROMPT) for r in fake.requests),
+                  "raw prompts start with the system prefix")
+            check(all(r["cached_prefix"] >= len(SYSTEM_PROMPT) for r in asked),
+                  "each answer reuses the whole system prefix of the previous request")
+        else:
+            check(all(r.get("system") == SYSTEM_PROMPT for r in fake.requests),
+                  "every request sends the same system prompt")
+    finally:
+        server.shutdown()
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--load-time", type=float, default=1.0, help="simulated model load seconds")
+    args = parser.parse_args()
+
+    failures = run_check(load_time=args.load_time)
+    if failures:
+        print(f" {len(failures)} check(s) failed")
+        sys.exit(1)
+    print(" All checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""HTTP load generator and saturation report for the FastAPI service.
+
+Sweeps concurrency levels against /ask (or /ask/stream with --stream),
+with questions drawn from the regulation corpus, and reports throughput,
+latency percentiles, error and rejection rates and the level at which
+the service saturates. Pair it with tools.fake_ollama to take the real
+LLM out of the measurement:
+
+    python -m tools.fake_ollama --port 11434 --token-latency 0.03 &
+    uvicorn app.main:app --workers 2 &
+    python -m tools.loadgen --url http://127.0.0.1:8000 --concurrency 1,2,4,8,16
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.config import PDF_DIR
+
+SOURCE_PATTERN = re.compile(r'^(UU|POJK|SEOJK)_(\d+)_(\d{4})\.pdf$', re.IGNORECASE)
+
+QUESTION_TEMPLATES = [
+    "Apa yang dimaksud dengan {type} {num} Tahun {year}?",
+    "Apa saja kewajiban bank menurut {type} {num} Tahun {year}?",
+    "Bagaimana ketentuan Pasal 1 dalam {type} Nomor {num} Tahun {year}?",
+    "Kapan {type} {num}/{year} mulai berlaku?",
+]
+
+# Questions without an explicit regulation take the early-exit path in ask()
+UNSCOPED_QUESTIONS = [
+    "Apa tugas dan wewenang OJK?",
+    "Bank mana yang wajib membentuk Capital Conservation Buffer?",
+]
+
+REJECTION_STATUSES = (429, 503)
+
+
+def corpus_questions(pdf_dir=PDF_DIR, unscoped_share=0.1):
+    questions = []
+    for path in sorted(Path(pdf_dir).glob("*.pdf")):
+        m = SOURCE_PATTERN.match(path.name)
+        if not m:
+            continue
+        reg_type, num, year = m.groups()
+        questions += [
+            t.format(type=reg_type.upper(), num=int(num), year=year)
+            for t in QUESTION_TEMPLATES
+        ]
+
+    if not questions:
+        questions = [t.format(type="POJK", num=27, year=2022) for t in QUESTION_TEMPLATES]
+
+    extra = max(1, int(len(questions) * unscoped_share))
+    return questions + [UNSCOPED_QUESTIONS[i % len(UNSCOPED_QUESTIONS)] for i in range(extra)]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    # Nearest rank: the smallest value with at least p% of samples at or below it
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def send_request(url, question, stream=False, timeout=120.0, scheduled=None):
+    """POST one question. Latency counts from `scheduled` when given (open loop)"""
+    start = scheduled or time.perf_counter()
+    body = json.dumps({"q": question}).encode()
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    result = {"status": 0, "latency": None, "ttfb": None, "error": None}
+
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            result["status"] = resp.status
+            # /ask/stream sends one JSON event per line; the first is
+            # the retrieval event (or the final result on early exit)
+            first = resp.readline() if stream else b""
+            result["ttfb"] = time.perf_counter() - start
+            if first or not stream:
+                resp.read()
+    except urllib.error.HTTPError as e:
+        result["status"] = e.code
+        result["error"] = f"HTTP {e.code}"
+    except Exception as e:
+        result["error"] = type(e).__name__
+
+    result["latency"] = time.perf_counter() - start
+    return result
+
+
+def run_closed_loop(url, questions, concurrency, duration, stream, timeout):
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            r = send_request(url, rng.choice(questions), stream, timeout)
+            with lock:
+                results.append(r)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def run_open_loop(url, questions, rate, concurrency, duration, stream, timeout):
+    """Poisson arrivals at `rate` req/s with at most `concurrency` in flight"""
+    rng = random.Random(0)
+    futures = []
+    started = time.perf_counter()
+    next_at = started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while next_at < started + duration:
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            futures.append(pool.submit(
+                send_request, url, rng.choice(questions), stream, timeout, next_at
+            ))
+            next_at += rng.expovariate(rate)
+        results = [f.result() for f in futures]
+
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    ok, rejected, errors = [], [], []
+    for r in results:
+        if 200 <= r["status"] < 300:
+            ok.append(r)
+        elif r["status"] in REJECTION_STATUSES:
+            rejected.append(r)
+        else:
+            errors.append(r)
+    latencies = [r["latency"] for r in ok]
+    ttfbs = [r["ttfb"] for r in ok if r["ttfb"] is not None]
+    total = max(len(results), 1)
+
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "throughput": len(ok) / elapsed if elapsed else 0.0,
+        "error_rate": len(errors) / total,
+        "rejection_rate": len(rejected) / total,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "ttfb_p50": percentile(ttfbs, 50),
+        "ttfb_p95": percentile(ttfbs, 95),
+    }
+
+
+def find_saturation(levels, min_gain=0.1, max_error_rate=0.01):
+    """Last level that still added >= min_gain throughput without failing"""
+    saturated_at = None
+    for prev, cur in zip(levels, levels[1:]):
+        failing = cur["error_rate"] + cur["rejection_rate"] > max_error_rate
+        if failing or cur["throughput"] < prev["throughput"] * (1 + min_gain):
+            saturated_at = prev["concurrency"]
+            break
+    return saturated_at
+
+
+def _fmt(value, scale=1.0, digits=2):
+    return "-" if value is None else f"{value * scale:.{digits}f}"
+
+
+def print_report(levels, saturated_at):
+    print(f"\n{'conc':>5} {'req':>6} {'rps':>7} {'p50':>7} {'p90':>7} {'p95':>7} "
+          f"{'p99':>7} {'ttfb95':>7} {'err%':>6} {'rej%':>6}")
+    for s in levels:
+        print(f"{s['concurrency']:>5} {s['requests']:>6} {_fmt(s['throughput']):>7} "
+              f"{_fmt(s['p50']):>7} {_fmt(s['p90']):>7} {_fmt(s['p95']):>7} {_fmt(s['p99']):>7} "
+              f"{_fmt(s['ttfb_p95']):>7} {_fmt(s['error_rate'], 100, 1):>6} "
+              f"{_fmt(s['rejection_rate'], 100, 1):>6}")
+
+    if saturated_at is None:
+        print("\nNo saturation observed; extend the concurrency sweep.")
+    else:
+        print(f"\nSaturates at concurrency {saturated_at} "
+              f"(next level added <10% throughput or started failing).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default=None, help="default /ask, or /ask/stream with --stream")
+    parser.add_argument("--stream", action="store_true",
+                        help="hit the NDJSON streaming route and record time to its first event")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="comma separated levels")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop arrival rate (req/s) per level")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per level")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--spawn-fake-llm", type=int, metavar="PORT", default=None,
+                        help="start tools.fake_ollama on PORT in this process")
+    parser.add_argument("--token-latency", type=float, default=0.05)
+    parser.add_argument("--json", dest="json_out", default=None, help="write the report to this file")
+    args = parser.parse_args()
+
+    if args.spawn_fake_llm:
+        from tools.fake_ollama import start_fake_ollama
+        start_fake_ollama(port=args.spawn_fake_llm, token_latency=args.token_latency)
+
+    endpoint = args.endpoint or ("/ask/stream" if args.stream else "/ask")
+    url = args.url.rstrip("/") + endpoint
+    questions = corpus_questions(args.pdf_dir)
+    print(f" {len(questions)} questions, target {url}")
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        if args.rate:
+            results, elapsed = run_open_loop(
+                url, questions, args.rate, concurrency, args.duration, args.stream, args.timeout
+            )
+        else:
+            results, elapsed = run_closed_loop(
+                url, questions, concurrency, args.duration, args.stream, args.timeout
+            )
+        stats = {"concurrency": concurrency, **summarize(results, elapsed)}
+        levels.append(stats)
+        print(f" concurrency={concurrency}: {stats['throughput']:.2f} req/s, p95={_fmt(stats['p95'])}s")
+
+    saturated_at = find_saturation(levels)
+    print_report(levels, saturated_at)
+
+    if args.json_out:
+        Path(args.json_out).write_text(
+            json.dumps({"url": url, "levels": levels, "saturated_at": saturated_at}, indent=2),
+            encoding="utf-8"
+        )
+
+
+if __name__ == "__main__":
+    main()